@@ -1,3 +1,4 @@
+import argparse
 import os
 import pandas as pd
 import matplotlib.pyplot as plt
@@ -6,6 +7,11 @@ from collections import Counter
 import re
 import warnings
 
+from commit_files import find_commits_path, read_commits
+from fields import STEP_FIELDS
+from store import is_store, load_analysis, load_commits
+import warehouse
+
 
 warnings.simplefilter("ignore", category=FutureWarning)
 
@@ -13,7 +19,16 @@ warnings.simplefilter("ignore", category=FutureWarning)
 
 # Extraction Functions
 
+# Commit columns read by the visualisations below
+COMMIT_COLUMNS = sorted({column for step in ['weekly_commits', 'commit_size_distribution', 'geographic_diversity', 'file_types']
+                         for column in STEP_FIELDS[step]})
+
 def load_and_aggregate_data(current_dir):
+    # A dataset store (mining.py --store) is read from the few large files of its partitions
+    if is_store(current_dir):
+        analysis_data = load_analysis(current_dir)
+        return analysis_data, load_commits(current_dir, COMMIT_COLUMNS), len(analysis_data)
+
     all_analysis_data = []
     all_commits_data = []
     folder_counter = 0
@@ -21,15 +36,16 @@ def load_and_aggregate_data(current_dir):
         folder_path = os.path.join(current_dir, folder)
         if os.path.isdir(folder_path):
             analysis_file = os.path.join(folder_path, folder + '_analysis.csv')
-            commits_file = os.path.join(folder_path, folder + '_commits.csv')
+            # The commits CSV or the Parquet dataset written with --output-format parquet
+            commits_file = find_commits_path(folder_path, folder)
             try:
                 if os.path.exists(analysis_file) and os.path.getsize(analysis_file) > 0:
                     analysis_df = pd.read_csv(analysis_file)
                     # Check if the repository has more than one contributor
                     # if analysis_df['Number of Contributors'].iloc[0] > 1:
                     all_analysis_data.append(analysis_df)
-                    if os.path.exists(commits_file) and os.path.getsize(commits_file) > 0:
-                        all_commits_data.append(pd.read_csv(commits_file))
+                    if commits_file is not None and os.path.getsize(commits_file) > 0:
+                        all_commits_data.append(read_commits(commits_file, COMMIT_COLUMNS))
                         folder_counter += 1
             except pd.errors.EmptyDataError:
                 print(f"Empty or invalid data in {analysis_file} or {commits_file}")
@@ -37,6 +53,19 @@ def load_and_aggregate_data(current_dir):
     combined_commits_data = pd.concat(all_commits_data, ignore_index=True)
     return combined_analysis_data, combined_commits_data, folder_counter
 
+def load_warehouse_data(warehouse_path):
+    # Query-backed variant of the above for a warehouse (mining.py --warehouse): weekly commits are counted by
+    # an index scan in SQLite instead of loading every commit date
+    connection = warehouse.connect(warehouse_path)
+    try:
+        analysis_data = warehouse.analysis_records(connection)
+        commit_columns = [column for column in COMMIT_COLUMNS if column != 'Author Date']
+        commits_data = warehouse.commit_frame(connection, commit_columns)
+        weekly_counts = warehouse.weekly_commit_counts(connection)
+    finally:
+        connection.close()
+    return analysis_data, commits_data, len(analysis_data), weekly_counts
+
 
 
 # ------------------------------------------------------------------------------------------
@@ -140,13 +169,17 @@ def contributors_distribution(analysis_data, current_directory):
         print("Contributors Plot Failed to Save")
 
 
-def weekly_commits(commits_data, current_directory):
+def weekly_commits(commits_data, current_directory, weekly_counts=None):
     try:
         weekly_commits_plot_path = os.path.join(current_directory, 'weekly_commits.png')
-        commits_data['Author Date'] = pd.to_datetime(commits_data['Author Date'], utc=True, errors='coerce')
-        commits_data.dropna(subset=['Author Date'], inplace=True)
-        commits_data.set_index('Author Date', inplace=True)
-        weekly_commits = commits_data.resample('W').size()
+        if weekly_counts is not None:
+            # Already counted by the warehouse query
+            weekly_commits = weekly_counts
+        else:
+            commits_data['Author Date'] = pd.to_datetime(commits_data['Author Date'], utc=True, errors='coerce')
+            commits_data.dropna(subset=['Author Date'], inplace=True)
+            commits_data.set_index('Author Date', inplace=True)
+            weekly_commits = commits_data.resample('W').size()
         
         plt.figure(figsize=(14, 7))
         plt.plot(weekly_commits.index, weekly_commits.values, marker='o', linestyle='-')
@@ -231,8 +264,11 @@ def file_types(commits_data, current_directory):
         file_types = Counter()
 
         for files in commits_data['modified_files']:
-            # Split the files, clean extensions, and convert to lower case
-            files = [clean_extension(os.path.splitext(file)[1]) for file in files.split()]
+            # CSV rows hold the repr of the file list, Parquet rows the list itself
+            if isinstance(files, str):
+                files = files.split()
+            # Clean extensions, and convert to lower case
+            files = [clean_extension(os.path.splitext(file)[1]) for file in files]
             # Filter out entries that are empty or just a period
             files = [file for file in files if file and file != '.']
             file_types.update(files)
@@ -259,8 +295,16 @@ def file_types(commits_data, current_directory):
 # ------------------------------------------------------------------------------------------
     
 def main():
+    parser = argparse.ArgumentParser(description='Visualise the repositories mined into the current folder.')
+    parser.add_argument('--warehouse', default=None, help='SQLite warehouse written by mining.py --warehouse to query instead')
+    args = parser.parse_args()
+
     current_directory = os.getcwd()
-    analysis_data, commits_data, folder_count = load_and_aggregate_data(current_directory)  # Load and aggregate data
+    weekly_counts = None
+    if args.warehouse is not None:
+        analysis_data, commits_data, folder_count, weekly_counts = load_warehouse_data(args.warehouse)
+    else:
+        analysis_data, commits_data, folder_count = load_and_aggregate_data(current_directory)  # Load and aggregate data
 
     print("----------------------------------------")
     print("Analysis of Data Extracted:")
@@ -273,7 +317,7 @@ def main():
     
     gini_coefficient_distribution(analysis_data, current_directory)  # Visualisation 1
     contributors_distribution(analysis_data, current_directory)  # Visualisation 2
-    weekly_commits(commits_data, current_directory)  # Visualisation 3
+    weekly_commits(commits_data, current_directory, weekly_counts)  # Visualisation 3
     commit_size_distribution(commits_data, current_directory)  # Visualisation 4
     geographic_diversity(commits_data, current_directory)  # Visualisation 5
     file_types(commits_data, current_directory)  # Visualisation 6
@@ -0,0 +1,120 @@
+# Cross-repository cache of the diff-derived columns of commits (mining.py --commit-cache), keyed by commit
+# hash. A hash fixes the commit's content, so the diff stats and dmm metrics extracted for it in one repository
+# hold in every fork or copy that contains it, and later repositories reuse them instead of diffing again.
+# Records are zlib-compressed JSON in one SQLite table shared by all workers. A second table memoizes the risk
+# profiles of blobs for the dmm metrics (see dmm.py).
+
+from contextlib import contextmanager
+import json
+import sqlite3
+import zlib
+
+from fields import OPT_IN_FIELDS, STATS_FIELDS
+
+# Columns taken from the cache; the others are read from the commit's metadata, which costs no diff
+CACHED_FIELDS = STATS_FIELDS + OPT_IN_FIELDS
+# Columns that depend on the exclusion policy of the extraction (exclusion.py), kept per policy
+POLICY_FIELDS = ['deletions', 'insertions', 'lines']
+WRITE_BATCH_SIZE = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS commits (
+    hash BLOB PRIMARY KEY,
+    record BLOB NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS blobs (
+    hash BLOB NOT NULL,
+    reader TEXT NOT NULL,
+    low_size INTEGER NOT NULL,
+    high_size INTEGER NOT NULL,
+    low_complexity INTEGER NOT NULL,
+    high_complexity INTEGER NOT NULL,
+    low_interfacing INTEGER NOT NULL,
+    high_interfacing INTEGER NOT NULL,
+    PRIMARY KEY (hash, reader)
+) WITHOUT ROWID;
+"""
+
+#--------------------------------------------------------------------------------------------------------------
+
+class CommitCache:
+    def __init__(self, cache_path, policy_key=None):
+        self.path = cache_path
+        self.policy_key = policy_key
+        self.connection = sqlite3.connect(cache_path, timeout=60, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.executescript(SCHEMA)
+        self.pending = []
+        self.pending_profiles = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, commit_hash):
+        # Every cached column of the commit, or None
+        row = self.connection.execute('SELECT record FROM commits WHERE hash = ?', (bytes.fromhex(commit_hash),)).fetchone()
+        return json.loads(zlib.decompress(row[0])) if row is not None else None
+
+    def put(self, commit_hash, record):
+        self.pending.append((bytes.fromhex(commit_hash), zlib.compress(json.dumps(record).encode('utf-8'))))
+        if len(self.pending) >= WRITE_BATCH_SIZE:
+            self.flush()
+
+    def get_profile(self, blob_hash, reader):
+        # Risk profile of a blob as parsed by a lizard reader, or None; profiles not yet written are looked up
+        # too, as the blob after one change is usually the blob before the next
+        profile = self.pending_profiles.get((blob_hash, reader))
+        if profile is not None:
+            return profile
+        row = self.connection.execute('SELECT low_size, high_size, low_complexity, high_complexity, low_interfacing, '
+                                      'high_interfacing FROM blobs WHERE hash = ? AND reader = ?',
+                                      (bytes.fromhex(blob_hash), reader)).fetchone()
+        return tuple(row) if row is not None else None
+
+    def put_profile(self, blob_hash, reader, profile):
+        self.pending_profiles[(blob_hash, reader)] = profile
+        if len(self.pending_profiles) >= WRITE_BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        if not self.pending and not self.pending_profiles:
+            return
+        self.connection.execute('BEGIN IMMEDIATE')
+        self.connection.executemany('INSERT OR REPLACE INTO commits VALUES (?, ?)', self.pending)
+        self.connection.executemany('INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                                    ((bytes.fromhex(blob_hash), reader, *profile)
+                                     for (blob_hash, reader), profile in self.pending_profiles.items()))
+        self.connection.execute('COMMIT')
+        self.pending = []
+        self.pending_profiles = {}
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+@contextmanager
+def open_cache(cache_path, policy_key=None):
+    cache = CommitCache(cache_path, policy_key)
+    try:
+        yield cache
+    finally:
+        cache.close()
+
+#--------------------------------------------------------------------------------------------------------------
+
+# Used by the extractors for each commit: the cached columns of the plan when the cache has all of them
+# (None otherwise), and storing the columns computed on a miss alongside what was cached before. The line
+# counts extracted under an exclusion policy (the policy key of the cache) are recorded as '<column>:<policy key>'
+
+def record_key(field, policy_key=None):
+    return f"{field}:{policy_key}" if policy_key is not None and field in POLICY_FIELDS else field
+
+def cached_columns(cache, commit_hash, fields):
+    record = cache.get(commit_hash)
+    if record is not None and all(record_key(field, cache.policy_key) in record for field in fields):
+        cache.hits += 1
+        return {field: record[record_key(field, cache.policy_key)] for field in fields}, record
+    cache.misses += 1
+    return None, record
+
+def store_columns(cache, commit_hash, commit_data, fields, record=None):
+    cache.put(commit_hash, {**(record or {}), **{record_key(field, cache.policy_key): commit_data[field] for field in fields}})
@@ -0,0 +1,163 @@
+# Commit files of a repository: the CSV written by default, or a typed Parquet dataset (--output-format parquet)
+# with timestamps, list columns for the modified files and parents, and dictionary-encoded author names. A Parquet
+# dataset is a folder of part files, so an incremental run appends a part instead of rewriting the file.
+# pyarrow is an optional dependency, only needed for Parquet.
+
+import csv
+import glob
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+OUTPUT_FORMATS = ['csv', 'parquet']
+COMMIT_FILE_SUFFIXES = {'csv': '_commits.csv', 'parquet': '_commits.parquet'}
+
+# Git offsets are whole minutes, stored as int16 minutes (seconds west of UTC, as in the CSV, don't fit)
+TIMEZONE_FIELDS = ['Author Timezone', 'Committor Timezone']
+# Repeated on most rows, so dictionary-encoded in the Parquet files
+DICTIONARY_FIELDS = ['Author Name', 'Author Email', 'Committor Name', 'Committor Email']
+
+#--------------------------------------------------------------------------------------------------------------
+
+# Helper Functions
+
+def parquet_available():
+    return pq is not None
+
+def commits_path(github_name, output_format='csv'):
+    return os.path.join(github_name, f"{github_name}{COMMIT_FILE_SUFFIXES[output_format]}")
+
+def find_commits_path(folder_path, github_name):
+    # The commit file a repository folder holds, whichever format it was written in
+    for output_format in reversed(OUTPUT_FORMATS):
+        path = os.path.join(folder_path, f"{github_name}{COMMIT_FILE_SUFFIXES[output_format]}")
+        if os.path.exists(path):
+            return path
+    return None
+
+def is_parquet(path):
+    return path.endswith(COMMIT_FILE_SUFFIXES['parquet'])
+
+def part_paths(dataset_path):
+    # Parts still being written are named _part-*.parquet and are left out
+    return sorted(glob.glob(os.path.join(dataset_path, 'part-*.parquet')))
+
+#--------------------------------------------------------------------------------------------------------------
+
+# Parquet schema of the commit columns
+
+def commit_types():
+    return {
+        'Hash': pa.string(),
+        'Commit Message': pa.string(),
+        'Author Name': pa.string(),
+        'Author Email': pa.string(),
+        'Committor Name': pa.string(),
+        'Committor Email': pa.string(),
+        'Author Date': pa.timestamp('us', tz='UTC'),
+        'Author Timezone': pa.int16(),
+        'Committor Date': pa.timestamp('us', tz='UTC'),
+        'Committor Timezone': pa.int16(),
+        'in_main_branch': pa.bool_(),
+        'merge': pa.bool_(),
+        'modified_files': pa.list_(pa.string()),
+        'parents': pa.list_(pa.string()),
+        'deletions': pa.int64(),
+        'insertions': pa.int64(),
+        'lines': pa.int64(),
+        'files': pa.int32(),
+        'dmm_unit_size': pa.float64(),
+        'dmm_unit_complexity': pa.float64(),
+        'dmm_unit_interfacing': pa.float64()
+    }
+
+def commit_table(rows, fields):
+    types = commit_types()
+    columns = []
+    for field in fields:
+        values = [row[field] for row in rows]
+        if field in TIMEZONE_FIELDS:
+            values = [value // 60 for value in values]
+        columns.append(pa.array(values, type=types[field]))
+    return pa.Table.from_arrays(columns, schema=pa.schema([(field, types[field]) for field in fields]))
+
+#--------------------------------------------------------------------------------------------------------------
+
+# Writing: one Parquet part per call, written under a hidden name and renamed once complete. Used like
+# csv.DictWriter (writerows with batches of commit dicts)
+
+class ParquetCommitWriter:
+    def __init__(self, dataset_path, fields):
+        self.dataset_path = dataset_path
+        self.fields = fields
+        self.writer = None
+        self.bytes_written = 0
+        os.makedirs(dataset_path, exist_ok=True)
+        self.part_path = os.path.join(dataset_path, f"part-{len(part_paths(dataset_path)):05d}.parquet")
+        self.partial_path = os.path.join(dataset_path, '_' + os.path.basename(self.part_path))
+
+    def __enter__(self):
+        return self
+
+    def writerows(self, rows):
+        table = commit_table(rows, self.fields)
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.partial_path, table.schema, compression='zstd',
+                                           use_dictionary=[field for field in self.fields if field in DICTIONARY_FIELDS])
+        self.writer.write_table(table)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.writer is not None:
+            self.writer.close()
+            if exc_type is None:
+                os.replace(self.partial_path, self.part_path)
+                self.bytes_written = os.path.getsize(self.part_path)
+        if os.path.exists(self.partial_path):
+            os.remove(self.partial_path)
+        return False
+
+#--------------------------------------------------------------------------------------------------------------
+
+# Reading with column projection; columns missing from the file are left out. Timezones are returned in
+# seconds, as the CSV holds them. Only empty CSV fields are missing values: author names and messages such as
+# "NA" or "None" are read back as the text they were written as
+
+CSV_NA_VALUES = ['']
+
+def commit_fields(path):
+    if is_parquet(path):
+        return pq.read_schema(part_paths(path)[0]).names
+    with open(path, newline='', encoding='utf-8') as file:
+        return next(csv.reader(file))
+
+def parquet_frame(table):
+    df = table.to_pandas()
+    for field in TIMEZONE_FIELDS:
+        if field in df:
+            df[field] = df[field].astype('int64') * 60
+    return df
+
+def read_commits(path, columns=None):
+    if columns is not None:
+        fields = commit_fields(path)
+        columns = [column for column in columns if column in fields]
+    if is_parquet(path):
+        return parquet_frame(pa.concat_tables([pq.read_table(part_path, columns=columns) for part_path in part_paths(path)]))
+    return pd.read_csv(path, usecols=columns, keep_default_na=False, na_values=CSV_NA_VALUES)
+
+def iter_commit_chunks(path, columns=None, chunk_size=50000):
+    if columns is not None:
+        fields = commit_fields(path)
+        columns = [column for column in columns if column in fields]
+    if is_parquet(path):
+        for part_path in part_paths(path):
+            for batch in pq.ParquetFile(part_path).iter_batches(batch_size=chunk_size, columns=columns):
+                yield parquet_frame(pa.Table.from_batches([batch]))
+    else:
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunk_size, keep_default_na=False, na_values=CSV_NA_VALUES)
@@ -0,0 +1,64 @@
+# Delta Maintainability Model metrics (dmm_unit_size, dmm_unit_complexity, dmm_unit_interfacing) computed as
+# pydriller computes them, from the risk profiles of the blobs before and after each modified file. pydriller runs
+# lizard over both contents of every modified file of a commit, once per metric; here the profile of a blob is
+# memoized in the commit cache by blob hash, so each blob is parsed once across commits, branches and forks (the
+# content after one change is the content before the next).
+
+import lizard
+import lizard_languages
+from pydriller.domain.commit import Commit, DMMProperty, Method, ModifiedFile
+
+# dmm columns and the property each one measures, in the order of the (low, high) pairs of a risk profile
+DMM_PROPERTIES = {
+    'dmm_unit_size': DMMProperty.UNIT_SIZE,
+    'dmm_unit_complexity': DMMProperty.UNIT_COMPLEXITY,
+    'dmm_unit_interfacing': DMMProperty.UNIT_INTERFACING
+}
+EMPTY_PROFILE = (0,) * (2 * len(DMM_PROPERTIES))
+
+#--------------------------------------------------------------------------------------------------------------
+
+# Risk profiles: the volume (lines of code) of the low and of the high risk methods of a file, for each property
+
+def risk_profile(source_code, filename):
+    if not source_code:
+        return EMPTY_PROFILE
+    analysis = lizard.analyze_file.analyze_source_code(filename, source_code)
+    methods = [Method(func) for func in analysis.function_list]
+    return tuple(volume for dmm_property in DMM_PROPERTIES.values()
+                 for volume in ModifiedFile._risk_profile(methods, dmm_property))
+
+def blob_profile(cache, blob, filename, reader):
+    # Files added or deleted by the commit have no blob on one side
+    if blob is None:
+        return EMPTY_PROFILE
+    profile = cache.get_profile(blob.hexsha, reader)
+    if profile is None:
+        # Decoded as pydriller decodes file contents
+        profile = risk_profile(blob.data_stream.read().decode('utf-8', 'ignore'), filename)
+        cache.put_profile(blob.hexsha, reader, profile)
+    return profile
+
+#--------------------------------------------------------------------------------------------------------------
+
+# dmm columns of a commit; None when no modified file is in a language lizard reads, or nothing changed the
+# volume of its methods
+
+def dmm_columns(commit, cache, fields):
+    delta = None
+    for modified_file in commit.modified_files:
+        # Files are parsed by the reader of their name after the change, before and after alike
+        reader = lizard_languages.get_reader_for(modified_file.filename)
+        if reader is None:
+            continue
+        # pydriller keeps the GitPython diff of a modified file, with its blobs, in _c_diff
+        before = blob_profile(cache, modified_file._c_diff.a_blob, modified_file.filename, reader.__name__)
+        after = blob_profile(cache, modified_file._c_diff.b_blob, modified_file.filename, reader.__name__)
+        file_delta = [volume_after - volume_before for volume_after, volume_before in zip(after, before)]
+        delta = file_delta if delta is None else [total + volume for total, volume in zip(delta, file_delta)]
+
+    columns = {}
+    for index, field in enumerate(DMM_PROPERTIES):
+        if field in fields:
+            columns[field] = None if delta is None else Commit._good_change_proportion(delta[2 * index], delta[2 * index + 1])
+    return columns
@@ -0,0 +1,113 @@
+# Exclusion of vendored, generated and oversized files from the diffs of the extraction (mining.py
+# --exclude-paths, --max-diff-size). Excluded files are marked as not diffable for git (the -diff attribute, and
+# core.bigFileThreshold for their size), so git reports them like binary files without reading or diffing their
+# contents: they still count in files and modified_files, but add no insertions, deletions or lines. The policy
+# reaches every git command of the extraction, of either backend, through the environment.
+
+from contextlib import contextmanager
+import hashlib
+import json
+import os
+import subprocess
+import tempfile
+
+# Paths excluded by --exclude-paths without patterns, in gitattributes syntax
+DEFAULT_EXCLUDED_PATHS = [
+    # Vendored dependencies
+    '**/node_modules/**', '**/bower_components/**', '**/vendor/**', '**/third_party/**', '**/site-packages/**',
+    # Lockfiles
+    'package-lock.json', 'yarn.lock', 'pnpm-lock.yaml', 'poetry.lock', 'Pipfile.lock', 'Cargo.lock', 'Gemfile.lock',
+    'composer.lock', 'go.sum',
+    # Minified and generated assets
+    '*.min.js', '*.min.css', '*.js.map', '*.css.map', '*.bundle.js', '*_pb2.py',
+    # Notebooks, whose outputs are stored inline
+    '*.ipynb',
+    # Data dumps
+    '*.csv', '*.tsv', '*.jsonl', '*.ndjson', '*.sql', '*.dump', '*.arff'
+]
+
+#--------------------------------------------------------------------------------------------------------------
+
+# Policy: the path patterns and size limit (in bytes) of the excluded files, or None when nothing is excluded
+
+def exclusion_policy(patterns=None, max_size=None):
+    if patterns is None and max_size is None:
+        return None
+    return {'patterns': list(patterns or []), 'max_size': max_size}
+
+def policy_key(policy):
+    # Short signature of a policy, under which the commit cache keeps the line counts extracted with it
+    if policy is None:
+        return None
+    return hashlib.sha1(json.dumps(policy, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+
+@contextmanager
+def git_environment(policy):
+    # Passes the policy to git as configuration (GIT_CONFIG_COUNT/KEY/VALUE) for as long as it is active
+    if policy is None:
+        yield
+        return
+    saved = {name: value for name, value in os.environ.items() if name.startswith('GIT_CONFIG_')}
+    with tempfile.NamedTemporaryFile('w', suffix='.attributes', encoding='utf-8') as attributes:
+        attributes.writelines(f"{pattern} -diff\n" for pattern in policy['patterns'])
+        attributes.flush()
+        settings = [('core.attributesFile', attributes.name)]
+        if policy['max_size'] is not None:
+            settings.append(('core.bigFileThreshold', str(policy['max_size'])))
+        first = int(os.environ.get('GIT_CONFIG_COUNT', 0))
+        for index, (key, value) in enumerate(settings, first):
+            os.environ[f'GIT_CONFIG_KEY_{index}'] = key
+            os.environ[f'GIT_CONFIG_VALUE_{index}'] = value
+        os.environ['GIT_CONFIG_COUNT'] = str(first + len(settings))
+        try:
+            yield
+        finally:
+            for name in [name for name in os.environ if name.startswith('GIT_CONFIG_')]:
+                del os.environ[name]
+            os.environ.update(saved)
+
+#--------------------------------------------------------------------------------------------------------------
+
+# Counts of the file changes the policy excluded from a repository's extracted history, by path and by size.
+# Read from the trees alone (git log --raw, no diff) while the policy is active
+
+NULL_BLOB = '0' * 40
+
+def changed_files(repo_dir, since_commit=None):
+    # (path, blob before, blob after) of every file change of the non-merge history of HEAD
+    revisions = ['HEAD'] if since_commit is None else ['HEAD', f'^{since_commit}']
+    output = subprocess.run(['git', '-C', repo_dir, 'log', *revisions, '--no-merges', '--no-renames', '--raw',
+                             '--no-abbrev', '-z', '--format='], check=True, capture_output=True).stdout
+    tokens = output.decode('utf-8', 'surrogateescape').split('\0')
+    for meta, path in zip(tokens[0::2], tokens[1::2]):
+        _, _, before, after, _ = meta.strip().split(' ')
+        yield path, before, after
+
+def excluded_paths(repo_dir, paths):
+    if not paths:
+        return set()
+    output = subprocess.run(['git', '-C', repo_dir, 'check-attr', '-z', '--stdin', 'diff'],
+                            input=('\0'.join(paths) + '\0').encode('utf-8', 'surrogateescape'), check=True,
+                            capture_output=True).stdout
+    tokens = output.decode('utf-8', 'surrogateescape').split('\0')
+    return {path for path, _, value in zip(tokens[0::3], tokens[1::3], tokens[2::3]) if value == 'unset'}
+
+def blob_sizes(repo_dir, blobs):
+    if not blobs:
+        return {}
+    output = subprocess.run(['git', '-C', repo_dir, 'cat-file', '--batch-check=%(objectname) %(objectsize)'],
+                            input=''.join(f"{blob}\n" for blob in blobs), check=True, capture_output=True,
+                            text=True).stdout
+    return {blob: int(size) for blob, size in (line.split(' ') for line in output.splitlines()) if size.isdigit()}
+
+def count_excluded(repo_dir, policy, since_commit=None):
+    changes = list(changed_files(repo_dir, since_commit))
+    by_path = excluded_paths(repo_dir, list({path for path, _, _ in changes}))
+    counts = {'path': sum(path in by_path for path, _, _ in changes), 'size': 0}
+    if policy['max_size'] is not None:
+        # git treats a file as binary when either side of its change is over the limit
+        blobs = {blob for path, before, after in changes if path not in by_path for blob in (before, after) if blob != NULL_BLOB}
+        sizes = blob_sizes(repo_dir, blobs)
+        counts['size'] = sum(path not in by_path and max(sizes.get(before, 0), sizes.get(after, 0)) > policy['max_size']
+                             for path, before, after in changes)
+    return counts
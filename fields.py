@@ -0,0 +1,104 @@
+# Registry of the commit columns that can be extracted and of the columns each downstream step reads.
+# The extractors only evaluate the pydriller properties behind the columns of the extraction plan.
+
+#--------------------------------------------------------------------------------------------------------------
+
+# Commit columns, in CSV order, with how each one is read from a pydriller Commit
+
+COMMIT_FIELDS = {
+    'Hash': lambda commit: commit.hash,
+    'Commit Message': lambda commit: commit.msg,
+    'Author Name': lambda commit: commit.author.name,
+    'Author Email': lambda commit: commit.author.email,
+    'Committor Name': lambda commit: commit.committer.name,
+    'Committor Email': lambda commit: commit.committer.email,
+    'Author Date': lambda commit: commit.author_date,
+    'Author Timezone': lambda commit: commit.author_timezone,
+    'Committor Date': lambda commit: commit.committer_date,
+    'Committor Timezone': lambda commit: commit.committer_timezone,
+    'in_main_branch': lambda commit: True, # Only the default branch's history is traversed
+    'merge': lambda commit: False, # Merges are excluded by the traversal (only_no_merge)
+    'modified_files': lambda commit: [file.filename for file in commit.modified_files], # Full diff of the commit
+    'parents': lambda commit: commit.parents,
+    'deletions': lambda commit: commit.deletions, # deletions, insertions, lines and files share one numstat
+    'insertions': lambda commit: commit.insertions,
+    'lines': lambda commit: commit.lines,
+    'files': lambda commit: commit.files,
+    'dmm_unit_size': lambda commit: commit.dmm_unit_size, # dmm metrics run lizard over every modified file
+    'dmm_unit_complexity': lambda commit: commit.dmm_unit_complexity,
+    'dmm_unit_interfacing': lambda commit: commit.dmm_unit_interfacing
+}
+
+# Always extracted so every row can be identified
+KEY_FIELDS = ['Hash']
+
+# Too expensive to derive from the steps; only extracted when explicitly requested
+OPT_IN_FIELDS = ['dmm_unit_size', 'dmm_unit_complexity', 'dmm_unit_interfacing']
+
+# Columns computed from the numstat of a commit
+STATS_FIELDS = ['deletions', 'insertions', 'lines', 'files', 'modified_files']
+
+#--------------------------------------------------------------------------------------------------------------
+
+# Commit columns read by each analysis (mining.py, analysis.py), score (score.py) and warehouse (warehouse.py) step
+
+STEP_FIELDS = {
+    # plots.py charts and mining.perform_analysis
+    'commits_by_authors': ['Author Name'],
+    'plot_commit_impact_by_top_authors': ['Author Name', 'insertions', 'deletions'],
+    'gini_coefficient': ['Author Name'],
+    'number_of_contributors': ['Author Name'],
+    'calculate_commit_frequency': ['Author Date'],
+    'calculate_percentage_with_5_or_more_commits': ['Author Name'],
+    'average_commit_size': ['lines'],
+    'unique_timezones': ['Author Timezone'],
+    'calculate_commit_scores': ['Commit Message'],
+    'project_duration': ['Author Date'],
+
+    # analysis.py visualisations
+    'weekly_commits': ['Author Date'],
+    'commit_size_distribution': ['insertions', 'deletions'],
+    'geographic_diversity': ['Author Timezone'],
+    'file_types': ['modified_files'],
+
+    # score.py reads the analysis record, which is built from these columns
+    'calculate_scores': ['Author Name', 'Author Date', 'Commit Message', 'lines'],
+
+    # warehouse.py author queries of the commits loaded by mining.py --warehouse
+    'repos_by_author': ['Author Email'],
+}
+
+# Only planned along with a warehouse to load the commits into
+WAREHOUSE_STEPS = ['repos_by_author']
+
+#--------------------------------------------------------------------------------------------------------------
+
+# Build the extraction plan: the ordered list of commit columns to extract
+
+def extraction_plan(steps=None, extra_fields=(), warehouse=False):
+    if steps is None:
+        steps = [step for step in STEP_FIELDS if step not in WAREHOUSE_STEPS]
+    if warehouse:
+        steps = list(steps) + WAREHOUSE_STEPS
+
+    unknown_steps = [step for step in steps if step not in STEP_FIELDS]
+    if unknown_steps:
+        raise ValueError(f"Unknown analysis steps: {', '.join(unknown_steps)}")
+    unknown_fields = [field for field in extra_fields if field not in COMMIT_FIELDS]
+    if unknown_fields:
+        raise ValueError(f"Unknown commit fields: {', '.join(unknown_fields)}")
+
+    wanted = set(KEY_FIELDS) | set(extra_fields)
+    for step in steps:
+        wanted.update(field for field in STEP_FIELDS[step] if field not in OPT_IN_FIELDS)
+    return [field for field in COMMIT_FIELDS if field in wanted]
+
+# Group the planned columns by what evaluating them costs (timed as separate stages by the extractors)
+
+def field_stages(fields):
+    groups = [
+        ('extract.metadata', [field for field in fields if field not in STATS_FIELDS and field not in OPT_IN_FIELDS]),
+        ('extract.diff', [field for field in fields if field in STATS_FIELDS]),
+        ('extract.dmm', [field for field in fields if field in OPT_IN_FIELDS])
+    ]
+    return [(stage, stage_fields) for stage, stage_fields in groups if stage_fields]
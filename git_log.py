@@ -0,0 +1,153 @@
+# Streaming extraction backend built on a single `git log --numstat` subprocess per repository.
+# It produces the same columns as mining.extract_commits without building a pydriller Commit
+# object (and running a separate diff) for every commit.
+
+from datetime import datetime
+import os
+import subprocess
+import tempfile
+
+from fields import STATS_FIELDS, extraction_plan
+from mirror import local_clone
+
+#--------------------------------------------------------------------------------------------------------------
+
+# Each commit starts with a record separator, the header fields are separated by unit separators and the
+# (multi-line) message is terminated by one. With -z the header and every numstat entry end with a NUL, and
+# paths are output verbatim (not C-quoted), with both paths of a rename as separate entries
+
+RECORD_SEPARATOR = '\x1e'
+FIELD_SEPARATOR = '\x1f'
+HEADER_FIELDS = ['hash', 'parents', 'author_name', 'author_email', 'author_date',
+                 'committer_name', 'committer_email', 'committer_date', 'message']
+LOG_FORMAT = RECORD_SEPARATOR + FIELD_SEPARATOR.join(['%H', '%P', '%an', '%ae', '%aI', '%cn', '%ce', '%cI', '%B']) + FIELD_SEPARATOR
+
+def git_log_command(repo_dir, numstat=True, since_commit=None):
+    # Same history pydriller walks by default (HEAD, oldest first) with the merge commits left out up front.
+    # Renames are detected like git diff does for pydriller's stats and modified_files
+    revisions = ['HEAD'] if since_commit is None else ['HEAD', f'^{since_commit}']
+    command = ['git', '-C', repo_dir, 'log', *revisions, '--reverse', '--no-merges', '--find-renames',
+               '--no-color', '-z', f'--format={LOG_FORMAT}']
+    if numstat:
+        command.append('--numstat')
+    return command
+
+#--------------------------------------------------------------------------------------------------------------
+
+# Parsing of the git log stream
+
+def parse_git_date(value):
+    date = datetime.fromisoformat(value)
+    # pydriller (via GitPython) reports timezones as seconds west of UTC
+    timezone = -int(date.utcoffset().total_seconds())
+    return date, timezone
+
+def parse_numstat(entries):
+    modified_files = []
+    insertions = 0
+    deletions = 0
+    for added, removed, path in entries:
+        # Binary files are reported as '-' and count as no lines changed, as in commit.stats
+        insertions += int(added) if added != '-' else 0
+        deletions += int(removed) if removed != '-' else 0
+        modified_files.append(os.path.basename(path))
+    return modified_files, insertions, deletions
+
+def build_commit_data(header, numstat_entries):
+    fields = dict(zip(HEADER_FIELDS, header.split(FIELD_SEPARATOR)))
+    author_date, author_timezone = parse_git_date(fields['author_date'])
+    committer_date, committer_timezone = parse_git_date(fields['committer_date'])
+    modified_files, insertions, deletions = parse_numstat(numstat_entries)
+    return {
+        'Hash': fields['hash'],
+        'Commit Message': fields['message'].strip(),
+        'Author Name': fields['author_name'],
+        'Author Email': fields['author_email'],
+        'Committor Name': fields['committer_name'],
+        'Committor Email': fields['committer_email'],
+        'Author Date': author_date,
+        'Author Timezone': author_timezone,
+        'Committor Date': committer_date,
+        'Committor Timezone': committer_timezone,
+        'in_main_branch': True, # Only HEAD's history is walked
+        'merge': False, # Merges are excluded by --no-merges
+        'modified_files': modified_files,
+        'parents': fields['parents'].split(),
+        'deletions': deletions,
+        'insertions': insertions,
+        'lines': insertions + deletions,
+        'files': len(modified_files),
+        'dmm_unit_size': None, # dmm metrics need lizard and are not available from git log
+        'dmm_unit_complexity': None,
+        'dmm_unit_interfacing': None
+    }
+
+def project(commit_data, fields):
+    return {field: commit_data[field] for field in fields}
+
+READ_SIZE = 1 << 16
+
+def read_entries(stream):
+    # NUL-terminated entries of the stream, read in blocks
+    pending = ''
+    while True:
+        block = stream.read(READ_SIZE)
+        if not block:
+            break
+        entries = (pending + block).split('\0')
+        pending = entries.pop()
+        yield from entries
+    if pending:
+        yield pending
+
+def parse_git_log(stream, fields):
+    header = None
+    numstat_entries = []
+    entries = read_entries(stream)
+    for entry in entries:
+        if entry.startswith(RECORD_SEPARATOR):
+            if header is not None:
+                yield project(build_commit_data(header, numstat_entries), fields)
+            header = entry[1:]
+            numstat_entries = []
+        elif header is not None and entry.strip('\n'):
+            # The first entry after a header starts on a new line
+            added, removed, path = entry.lstrip('\n').split('\t', 2)
+            if not path:
+                # Rename or copy: the old and the new path follow; the new one is kept
+                next(entries)
+                path = next(entries)
+            numstat_entries.append((added, removed, path))
+    if header is not None:
+        yield project(build_commit_data(header, numstat_entries), fields)
+
+def stream_commits(repo_dir, fields, since_commit=None):
+    # The diff stats are only computed when a planned column needs them
+    numstat = any(field in STATS_FIELDS for field in fields)
+    # stderr goes to a file rather than a second pipe, which git could fill (and block on) while stdout is read
+    with tempfile.TemporaryFile('w+', encoding='utf-8', errors='replace') as stderr:
+        process = subprocess.Popen(git_log_command(repo_dir, numstat, since_commit), stdout=subprocess.PIPE, stderr=stderr,
+                                   text=True, encoding='utf-8', errors='replace')
+        try:
+            yield from parse_git_log(process.stdout, fields)
+            if process.wait() != 0:
+                stderr.seek(0)
+                raise RuntimeError(f"git log failed for {repo_dir}: {stderr.read().strip()}")
+        finally:
+            # Also reached when the consumer stops early, in which case git is still running
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            process.stdout.close()
+
+#--------------------------------------------------------------------------------------------------------------
+
+# Extract data from set repositories (drop-in alternative to mining.extract_commits)
+
+def extract_commits_git_log(repo_path, fields=None, since_commit=None):
+    if fields is None:
+        fields = extraction_plan()
+    print(f"Extracting data from repository: {repo_path} (git log backend)...")
+    with local_clone(repo_path) as repo_dir:
+        yield from stream_commits(repo_dir, fields, since_commit)
+    print(f"Repository {repo_path} extracted successfully.\n")
@@ -0,0 +1,127 @@
+# Run the mining of a single repository in its own killable process with a wall-clock and memory budget,
+# so one pathological repository can't stall a shard. Overruns are reported as failed results with the
+# progress made before the process was stopped.
+
+import multiprocessing
+import multiprocessing.forkserver
+import os
+import resource
+import signal
+import threading
+import time
+
+# Isolated processes are forked from a single-threaded fork server, as forking straight from a supervisor
+# running in a thread (or with pydriller's threads alive) can deadlock the child
+context = multiprocessing.get_context('forkserver')
+
+# Commits written so far by the isolated process, reported back to the supervisor on a timeout
+progress = None
+
+# Process that started the fork server; each worker process of a manifest run starts its own
+fork_server_pid = None
+fork_server_lock = threading.Lock()
+
+def report_progress(commit_count):
+    if progress is not None:
+        with progress.get_lock():
+            progress.value += commit_count
+
+#--------------------------------------------------------------------------------------------------------------
+
+# Isolated process
+
+def isolated_target(mine_repo, repo_path, memory_limit, progress_counter, connection):
+    global progress
+    progress = progress_counter
+    # Own process group so the git subprocesses are killed along with it
+    try:
+        os.setpgid(0, 0)
+    except OSError:
+        pass
+    if memory_limit is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+
+    try:
+        result = mine_repo(repo_path)
+    except MemoryError:
+        result = {'status': 'failed', 'error_class': 'memory_exceeded',
+                  'error_message': f"Memory budget of {memory_limit / 1e9:.2f} GB exceeded"}
+    except Exception as e:
+        result = {'status': 'failed', 'error_class': 'worker_error', 'error_message': str(e)}
+    connection.send(result)
+    connection.close()
+
+def kill_process_group(process):
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        process.kill()
+    process.join()
+
+#--------------------------------------------------------------------------------------------------------------
+
+# Supervisor
+
+def start_fork_server():
+    # The fork server imports the driver (and with it pandas and pydriller) once, so the isolated processes forked
+    # from it don't import them again. It is given the driver's folder as its import path, which it doesn't take
+    # over from this process (it is a fresh interpreter)
+    global fork_server_pid
+    with fork_server_lock:
+        if fork_server_pid == os.getpid():
+            return
+        context.set_forkserver_preload(['mining'])
+        python_path = os.environ.get('PYTHONPATH')
+        os.environ['PYTHONPATH'] = os.pathsep.join(filter(None, [os.path.dirname(os.path.abspath(__file__)), python_path]))
+        try:
+            multiprocessing.forkserver.ensure_running()
+        finally:
+            if python_path is None:
+                del os.environ['PYTHONPATH']
+            else:
+                os.environ['PYTHONPATH'] = python_path
+        fork_server_pid = os.getpid()
+
+def partial_timings(started, progress_counter):
+    # What is known about a child that never reported its own stage timings
+    return {'total_seconds': time.time() - started, 'commits': progress_counter.value}
+
+def run_isolated(mine_repo, repo_path, time_limit=None, memory_limit=None):
+    start_fork_server()
+    progress_counter = context.Value('q', 0)
+    reader, writer = context.Pipe(duplex=False)
+    process = context.Process(target=isolated_target,
+                               args=(mine_repo, repo_path, memory_limit, progress_counter, writer))
+    started = time.time()
+    process.start()
+    try:
+        os.setpgid(process.pid, process.pid) # Also set from this side in case the child hasn't run yet
+    except OSError:
+        pass
+    writer.close() # So a crashed child shows up as end-of-file rather than a hang
+
+    try:
+        if not reader.poll(time_limit):
+            kill_process_group(process)
+            print(f"Mining of {repo_path} timed out after {time.time() - started:.1f}s "
+                  f"({progress_counter.value} commits written). Moving on.")
+            return {'status': 'failed', 'error_class': 'timed_out',
+                    'error_message': f"Timed out after {time_limit}s with {progress_counter.value} commits written",
+                    'timings': partial_timings(started, progress_counter)}
+        try:
+            result = reader.recv()
+        except EOFError:
+            result = None
+        process.join()
+    finally:
+        reader.close()
+
+    if result is None:
+        result = {'status': 'failed', 'error_class': 'worker_error',
+                  'error_message': f"Worker exited with code {process.exitcode} after "
+                                   f"{progress_counter.value} commits written"}
+    if result['error_class'] in ('memory_exceeded', 'worker_error'):
+        print(f"Mining of {repo_path} failed: {result['error_message']}. Moving on.")
+    if not result.get('timings'):
+        result['timings'] = partial_timings(started, progress_counter)
+    return result
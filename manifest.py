@@ -0,0 +1,399 @@
+# SQLite manifest of mining jobs, one row per seed repository, so interrupted runs resume where they
+# stopped and permanently broken repositories are not attempted again. Workers claim pending rows
+# themselves, and failures with a retryable error class are retried with exponential backoff.
+#
+# Jobs carry the estimated cost of their repository (schedule.py), replaced by the commit count once it has
+# been mined, and are claimed most expensive first; workers of the small-repository lane claim the cheapest
+# first while small repositories are left.
+#
+# A claimed job is leased to its worker (host:pid), which renews the lease while it mines; jobs whose lease
+# runs out (the worker or its machine died) are handed to the next worker that asks. Workers take one
+# repository at a time from the whole seed range, so fast workers keep taking work until the queue is empty.
+# Workers on other machines share a manifest through `python manifest.py serve MANIFEST --host <address>` and
+# `mining.py --manifest http://<host>:<port>` (SQLite's locking is not reliable on network file systems).
+# The coordinator has no authentication, so it listens on localhost unless given the address of a trusted network.
+
+from contextlib import contextmanager
+import argparse
+import os
+import socket
+import sqlite3
+import threading
+import time
+import xmlrpc.client
+from xmlrpc.server import SimpleXMLRPCServer
+
+MAX_ATTEMPTS = 5
+BACKOFF_SECONDS = 60 # Delay before the first retry, doubled on every further attempt
+IDLE_POLL_SECONDS = 60 # Longest a worker sleeps while waiting for a retry to become due
+LEASE_SECONDS = 600 # A job is reassigned once its worker has not renewed the lease for this long
+LEASE_RENEW_SECONDS = LEASE_SECONDS / 4
+RUNNING_POLL_SECONDS = 5 # How often idle workers check on jobs still running elsewhere
+DEFAULT_PORT = 8765
+DEFAULT_HOST = '127.0.0.1'
+
+# Transient failures (network, disk, a killed worker); anything else is permanent
+RETRYABLE_ERRORS = {'clone_error', 'extraction_error', 'worker_error', 'interrupted', 'warehouse_error'}
+
+# Result fields recorded for a job
+RESULT_FIELDS = ['status', 'error_class', 'error_message', 'commits_csv', 'analysis_csv']
+SMALL_REPO_COMMITS = 1000 # Jobs below this cost are claimed by the small-repository lane (schedule.py)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    repo_url TEXT PRIMARY KEY,
+    github_name TEXT NOT NULL,
+    seed_index INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error_class TEXT,
+    error_message TEXT,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    started_at REAL,
+    finished_at REAL,
+    duration REAL,
+    commits_csv TEXT,
+    analysis_csv TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_pending ON jobs (status, next_attempt_at, seed_index);
+"""
+
+# Added to manifests written before jobs were leased and scheduled by cost
+ADDED_COLUMNS = {'worker': 'TEXT', 'lease_expires_at': 'REAL', 'cost': 'REAL', 'commit_count': 'INTEGER'}
+
+#--------------------------------------------------------------------------------------------------------------
+
+# Manifest set-up
+
+def connect(manifest_path):
+    # Transactions are managed explicitly so a claim can take the write lock up front (BEGIN IMMEDIATE)
+    connection = sqlite3.connect(manifest_path, timeout=60, isolation_level=None)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.executescript(SCHEMA)
+    columns = [row[1] for row in connection.execute('PRAGMA table_info(jobs)')]
+    for column, column_type in ADDED_COLUMNS.items():
+        if column not in columns:
+            connection.execute(f'ALTER TABLE jobs ADD COLUMN {column} {column_type}')
+    connection.execute('CREATE INDEX IF NOT EXISTS jobs_leases ON jobs (status, lease_expires_at)')
+    connection.execute('CREATE INDEX IF NOT EXISTS jobs_cost ON jobs (status, cost)')
+    return connection
+
+def add_jobs(connection, jobs):
+    # jobs are (repo_url, github_name, seed_index, cost); repositories already in the manifest keep their state,
+    # and their cost once they have a commit count
+    connection.execute('BEGIN IMMEDIATE')
+    connection.executemany("""
+        INSERT INTO jobs (repo_url, github_name, seed_index, cost) VALUES (?, ?, ?, ?)
+        ON CONFLICT (repo_url) DO UPDATE SET cost = COALESCE(commit_count, excluded.cost)""", jobs)
+    connection.execute('COMMIT')
+
+def requeue_done(connection, repo_urls=None):
+    # Done jobs (all of them, or those of the given repositories) go back to pending, so an incremental run mines
+    # them again to append their new commits; failed jobs stay failed. A one-shot step at the start of an
+    # incremental run (mining.py --requeue or manifest.py requeue), as workers joining the run later would
+    # otherwise requeue the jobs it has done since
+    connection.execute('BEGIN IMMEDIATE')
+    update = """
+        UPDATE jobs SET status = 'pending', attempts = 0, error_class = NULL, error_message = NULL, next_attempt_at = 0
+        WHERE status = 'done'"""
+    if repo_urls is None:
+        requeued = connection.execute(update).rowcount
+    else:
+        requeued = sum(connection.execute(update + ' AND repo_url = ?', (repo_url,)).rowcount for repo_url in repo_urls)
+    connection.execute('COMMIT')
+    return requeued
+
+def release_jobs(connection, where, params=()):
+    # Running jobs matching where go back to pending as interrupted, which counts as an attempt of their own.
+    # Called inside a transaction
+    connection.execute(f"""
+        UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                        error_class = 'interrupted', next_attempt_at = 0, worker = NULL, lease_expires_at = NULL
+        WHERE status = 'running' AND ({where})""", (MAX_ATTEMPTS, *params))
+
+def reset_interrupted(connection, dead_workers=()):
+    # Rows left 'running' by workers known to be dead, or whose lease ran out. Rows leased by live workers
+    # (possibly on other machines) are left alone
+    connection.execute('BEGIN IMMEDIATE')
+    release_jobs(connection, 'COALESCE(lease_expires_at, 0) <= ?', (time.time(),))
+    for worker in dead_workers:
+        release_jobs(connection, 'worker = ?', (worker,))
+    connection.execute('COMMIT')
+
+def running_workers(connection):
+    return [row[0] for row in connection.execute("SELECT DISTINCT worker FROM jobs WHERE status = 'running' AND worker IS NOT NULL")]
+
+def job_counts(connection):
+    return dict(connection.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall())
+
+#--------------------------------------------------------------------------------------------------------------
+
+# Claiming and finishing jobs
+
+def claim_job(connection, worker, lane='large'):
+    now = time.time()
+    connection.execute('BEGIN IMMEDIATE')
+    try:
+        # Jobs of workers that stopped renewing their lease are reassigned
+        release_jobs(connection, 'lease_expires_at <= ?', (now,))
+        row = None
+        if lane == 'small':
+            row = connection.execute("""
+                SELECT repo_url FROM jobs WHERE status = 'pending' AND next_attempt_at <= ? AND cost < ?
+                ORDER BY cost, seed_index LIMIT 1""", (now, SMALL_REPO_COMMITS)).fetchone()
+        if row is None:
+            # Jobs without a cost (added before costs were estimated) come last, in seed order
+            row = connection.execute("""
+                SELECT repo_url FROM jobs WHERE status = 'pending' AND next_attempt_at <= ?
+                ORDER BY cost DESC, seed_index LIMIT 1""", (now,)).fetchone()
+        if row is not None:
+            connection.execute("""
+                UPDATE jobs SET status = 'running', attempts = attempts + 1, started_at = ?, finished_at = NULL,
+                                worker = ?, lease_expires_at = ?
+                WHERE repo_url = ?""", (now, worker, now + LEASE_SECONDS, row[0]))
+        connection.execute('COMMIT')
+    except Exception:
+        connection.execute('ROLLBACK')
+        raise
+    return row[0] if row is not None else None
+
+def renew_lease(connection, repo_url, worker):
+    # False once the job was reassigned to another worker
+    cursor = connection.execute("UPDATE jobs SET lease_expires_at = ? WHERE repo_url = ? AND status = 'running' AND worker = ?",
+                                (time.time() + LEASE_SECONDS, repo_url, worker))
+    return cursor.rowcount > 0
+
+def finish_job(connection, repo_url, result, duration, worker=None):
+    # Returns the new status, or None when the lease was lost and the job belongs to another worker now
+    now = time.time()
+    connection.execute('BEGIN IMMEDIATE')
+    try:
+        row = connection.execute('SELECT attempts, status, worker FROM jobs WHERE repo_url = ?', (repo_url,)).fetchone()
+        if worker is not None and (row[1] != 'running' or row[2] != worker):
+            connection.execute('COMMIT')
+            return None
+        attempts = row[0]
+        next_attempt_at = 0
+        if result['status'] != 'failed':
+            status = 'done'
+        elif result['error_class'] in RETRYABLE_ERRORS and attempts < MAX_ATTEMPTS:
+            status = 'pending'
+            next_attempt_at = now + BACKOFF_SECONDS * 2 ** (attempts - 1)
+        else:
+            status = 'failed'
+        # Output paths are only recorded for repositories that produced them
+        outputs = (result.get('commits_csv'), result.get('analysis_csv')) if status == 'done' else (None, None)
+        connection.execute("""
+            UPDATE jobs SET status = ?, error_class = ?, error_message = ?, next_attempt_at = ?, finished_at = ?,
+                            duration = ?, commits_csv = ?, analysis_csv = ?, worker = NULL, lease_expires_at = NULL,
+                            commit_count = COALESCE(?, commit_count), cost = COALESCE(?, cost)
+            WHERE repo_url = ?""",
+            (status, result.get('error_class'), result.get('error_message'), next_attempt_at, now, duration,
+             *outputs, result.get('commit_count'), result.get('commit_count'), repo_url))
+        connection.execute('COMMIT')
+    except Exception:
+        connection.execute('ROLLBACK')
+        raise
+    return status
+
+def seconds_until_next_retry(connection):
+    # None when no job is pending or running any more. While jobs run elsewhere, idle workers check back every
+    # few seconds: the run may be over, or a job may come back when its lease runs out
+    now = time.time()
+    next_attempt_at, = connection.execute("SELECT MIN(next_attempt_at) FROM jobs WHERE status = 'pending'").fetchone()
+    lease_expires_at, = connection.execute("SELECT MIN(lease_expires_at) FROM jobs WHERE status = 'running'").fetchone()
+    waits = []
+    if next_attempt_at is not None:
+        waits.append(max(0, next_attempt_at - now))
+    if lease_expires_at is not None:
+        waits.append(min(max(0, lease_expires_at - now), RUNNING_POLL_SECONDS))
+    return min(waits) if waits else None
+
+#--------------------------------------------------------------------------------------------------------------
+
+# The operations workers use, on a local manifest file or through the coordinator of a shared one. The
+# coordinator serves a JobQueue over XML-RPC, so both are called the same way
+
+class JobQueue:
+    def __init__(self, manifest_path):
+        self.connection = connect(manifest_path)
+
+    def add_jobs(self, jobs):
+        add_jobs(self.connection, jobs)
+        return True
+
+    def requeue_done(self, repo_urls=None):
+        return requeue_done(self.connection, repo_urls)
+
+    def reset_interrupted(self, dead_workers=()):
+        reset_interrupted(self.connection, dead_workers)
+        return True
+
+    def running_workers(self):
+        return running_workers(self.connection)
+
+    def job_counts(self):
+        return job_counts(self.connection)
+
+    def claim_job(self, worker, lane='large'):
+        return claim_job(self.connection, worker, lane)
+
+    def renew_lease(self, repo_url, worker):
+        return renew_lease(self.connection, repo_url, worker)
+
+    def finish_job(self, repo_url, result, duration, worker):
+        return finish_job(self.connection, repo_url, result, duration, worker)
+
+    def seconds_until_next_retry(self):
+        return seconds_until_next_retry(self.connection)
+
+    def close(self):
+        self.connection.close()
+
+class RemoteJobQueue:
+    def __init__(self, address):
+        self.proxy = xmlrpc.client.ServerProxy(address, allow_none=True)
+
+    def __getattr__(self, name):
+        return getattr(self.proxy, name)
+
+    def close(self):
+        self.proxy('close')()
+
+def is_remote(manifest_address):
+    return manifest_address.startswith(('http://', 'https://'))
+
+def open_queue(manifest_address):
+    return RemoteJobQueue(manifest_address) if is_remote(manifest_address) else JobQueue(manifest_address)
+
+def worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def dead_local_workers(workers):
+    # Workers of this machine whose process is gone
+    hostname = socket.gethostname()
+    dead = []
+    for worker in workers:
+        host, _, pid = worker.rpartition(':')
+        if host != hostname:
+            continue
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            dead.append(worker)
+        except (PermissionError, ValueError):
+            pass
+    return dead
+
+#--------------------------------------------------------------------------------------------------------------
+
+# Worker loop: claim, mine and record jobs until no pending job is left
+
+@contextmanager
+def held_lease(manifest_address, repo_url, worker):
+    # Renews the lease of a job from a background thread (with a queue of its own) while it is mined
+    stop = threading.Event()
+
+    def renew():
+        queue = open_queue(manifest_address)
+        try:
+            while not stop.wait(LEASE_RENEW_SECONDS):
+                if not queue.renew_lease(repo_url, worker):
+                    print(f"Lease on {repo_url} lost; it was reassigned to another worker.")
+                    break
+        except Exception as e:
+            print(f"Error renewing the lease on {repo_url}: {e}")
+        finally:
+            queue.close()
+
+    thread = threading.Thread(target=renew, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+def run_worker(manifest_address, mine_repo, after_job=None, lane='large'):
+    queue = open_queue(manifest_address)
+    worker = worker_id()
+    jobs_done = 0
+    try:
+        while True:
+            repo_url = queue.claim_job(worker, lane)
+            if repo_url is None:
+                wait = queue.seconds_until_next_retry()
+                if wait is None:
+                    break
+                time.sleep(min(wait, IDLE_POLL_SECONDS))
+                continue
+
+            started = time.time()
+            jobs_done += 1
+            try:
+                with held_lease(manifest_address, repo_url, worker):
+                    result = mine_repo(repo_url)
+                    # The bookkeeping after a job (e.g. loading it into a warehouse) runs before its result is
+                    # recorded, which includes its failures
+                    if after_job is not None:
+                        after_job(repo_url, result, jobs_done)
+            except Exception as e:
+                print(f"Unexpected error mining {repo_url}: {e}")
+                result = {'status': 'failed', 'error_class': 'worker_error', 'error_message': str(e)}
+            recorded = {field: result.get(field) for field in RESULT_FIELDS}
+            # Commits of the whole history, not only those this run extracted (see mining.process_repo)
+            if result['status'] == 'done':
+                recorded['commit_count'] = result.get('commit_count')
+            if queue.finish_job(repo_url, recorded, time.time() - started, worker) is None:
+                print(f"{repo_url} was reassigned while it was mined; its result is not recorded.")
+    finally:
+        queue.close()
+
+#--------------------------------------------------------------------------------------------------------------
+
+# Coordinator for workers on several machines: owns the manifest file and serves the worker operations of its
+# JobQueue. Only these are callable remotely; close() and any other attribute of the queue are not
+
+SERVED_OPERATIONS = ['add_jobs', 'requeue_done', 'reset_interrupted', 'running_workers', 'job_counts', 'claim_job', 'renew_lease',
+                     'finish_job', 'seconds_until_next_retry']
+
+def serve(manifest_path, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    queue = JobQueue(manifest_path)
+    with SimpleXMLRPCServer((host, port), allow_none=True, logRequests=False) as server:
+        for name in SERVED_OPERATIONS:
+            server.register_function(getattr(queue, name), name)
+        print(f"Serving the manifest {manifest_path} on http://{host}:{port}: {queue.job_counts()}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            print(f"Manifest {manifest_path}: {queue.job_counts()}")
+            queue.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a job manifest to mining.py workers on other machines.')
+    parser.add_argument('command', choices=['serve', 'status', 'requeue'],
+                        help="'requeue' puts every done job back to pending, once before an incremental run")
+    parser.add_argument('manifest', help='SQLite job manifest')
+    parser.add_argument('--host', default=DEFAULT_HOST,
+                        help='Address to listen on (default: localhost only; e.g. 0.0.0.0 to serve workers on other machines)')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='Port to listen on')
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        serve(args.manifest, args.host, args.port)
+    elif args.command == 'requeue':
+        queue = JobQueue(args.manifest)
+        print(f"Requeued {queue.requeue_done()} done jobs of {args.manifest}.")
+        queue.close()
+    else:
+        queue = JobQueue(args.manifest)
+        print(f"Manifest {args.manifest}: {queue.job_counts()}")
+        for worker in queue.running_workers():
+            print(f"Running on {worker}")
+        queue.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -2,26 +2,85 @@
 from pydriller import *
 import pandas as pd
 from pandas import *
-import matplotlib
-import matplotlib.pyplot as plt
 import numpy as np
 from dateutil.relativedelta import relativedelta
+from datetime import datetime, timezone
+import argparse
+import contextlib
 import csv
+import functools
+import glob
+import itertools
+import multiprocessing
+import multiprocessing.pool
 import os
-
-matplotlib.use('Agg')
+import shutil
+import subprocess
+
+import commit_cache
+import commit_files
+import dmm
+import exclusion
+from fields import COMMIT_FIELDS, STEP_FIELDS, extraction_plan, field_stages
+from git_log import extract_commits_git_log
+import isolation
+import manifest
+import ranges
+import schedule
+import seeds
+import store
+import timing
+import warehouse
+from mirror import evict_mirrors, is_remote, local_clone, open_mirror, resolve_head
 
 #--------------------------------------------------------------------------------------------------------------
 
-# Insert the paths to the repositories you want to analyse:
+# Load the repository URLs from the seed CSV files (Set_*.csv shards or github_top800.csv)
+
+def read_seed_file(seed_file):
+    repo_paths = []
+    with open(seed_file, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        first_row = next(reader, None)
+        if first_row is None:
+            return repo_paths
+        # Set_*.csv shards have a header with the URL in the 'Link' column, github_top800.csv has no header
+        if 'Link' in first_row:
+            url_column = first_row.index('Link')
+        else:
+            url_column = 0
+            repo_paths.append(first_row[url_column])
+        for r in reader:
+            if len(r) > url_column:
+                repo_paths.append(r[url_column])
+    return repo_paths
+
+def load_repo_paths(seed_files):
+    return [repo_path for seed_file in seed_files for repo_path in read_seed_file(seed_file)]
+
+# Seed shard (file name without extension, e.g. Set_0_10000) each repository was listed in
+
+def load_repo_shards(seed_files):
+    return {repo_path: os.path.splitext(os.path.basename(seed_file))[0]
+            for seed_file in seed_files for repo_path in read_seed_file(seed_file)}
+
+# Repositories [start:end) and their seed shards; a seed manifest compiled by seeds.py is sliced with a range
+# query instead of reading every seed CSV
 
-f = open('Set_90000_100000.csv') # Insert CSV file here!
-reader = csv.reader(f)
-repo_paths=[]
-for r in reader:
-    repo_paths.append(r[2])
+def unique_repos(repo_paths):
+    # The seed shards list many repositories more than once (also under differently written URLs); each one is
+    # mined once, under the first URL it is listed with, as they would otherwise share their output folder
+    first_paths = {}
+    for repo_path in repo_paths:
+        first_paths.setdefault(extract_github_name(repo_path), repo_path)
+    return list(first_paths.values())
+
+def load_seeds(seed_files, start=0, end=None):
+    if len(seed_files) == 1 and seeds.is_seed_manifest(seed_files[0]):
+        rows = seeds.read_seed_range(seed_files[0], start, end)
+        return unique_repos([url for url, shard in rows]), dict(rows)
+    return unique_repos(load_repo_paths(seed_files)[start:end]), load_repo_shards(seed_files)
 
-print(repo_paths[2])
 #--------------------------------------------------------------------------------------------------------------
 
 # Extract the name of the repository from the URL and create an appropriately named folder
@@ -45,96 +104,62 @@ def create_folder(name):
 
 # Extract data from set repositories
 
-def extract_commits(repo_path):
-    commits_data = []
+def commit_rows(commits, fields, cache=None):
+    # Rows of the given pydriller commits. With a commit cache, the diff-derived columns of commits already
+    # extracted (in this or another repository) are reused
+    stages = field_stages(fields)
+    cached_fields = [field for field in fields if field in commit_cache.CACHED_FIELDS] if cache is not None else []
+    for commit in commits:
+        try:
+            # Only the properties behind the planned columns are evaluated, timed by cost group
+            commit_data = {}
+            if cached_fields:
+                with timing.stage('extract.cache'):
+                    cached, record = commit_cache.cached_columns(cache, commit.hash, cached_fields)
+                if cached is not None:
+                    commit_data.update(cached)
+            for stage, stage_fields in stages:
+                stage_fields = [field for field in stage_fields if field not in commit_data]
+                if not stage_fields:
+                    continue
+                with timing.stage(stage):
+                    if stage == 'extract.dmm' and cache is not None:
+                        # From the risk profiles of the commit's blobs, memoized in the cache
+                        commit_data.update(dmm.dmm_columns(commit, cache, stage_fields))
+                        continue
+                    for field in stage_fields:
+                        commit_data[field] = COMMIT_FIELDS[field](commit)
+            if cached_fields and cached is None:
+                with timing.stage('extract.cache'):
+                    commit_cache.store_columns(cache, commit.hash, commit_data, cached_fields, record)
+        except MemoryError:
+            raise  # Over the memory budget, reported by the isolated worker
+        except Exception as e:
+            print(f"Error reading commit {commit.hash}: {e}")
+            continue  # Skip the problematic commit and continue
+        yield commit_data
+
+def extract_commits(repo_path, fields=None, since_commit=None, cache=None, range_workers=1):
+    # Generator of commit rows, so a repository's history is never held in memory as a whole
+    if fields is None:
+        fields = extraction_plan()
     print(f"Extracting data from repository: {repo_path}...")
-    try:
-        for commit in Repository(repo_path).traverse_commits():
-            try:
-                if commit.in_main_branch and not commit.merge:
-                    commit_data = {
-                    'Hash': commit.hash,
-                    'Commit Message': commit.msg,
-                    'Author Name': commit.author.name,
-                    'Author Email': commit.author.email,
-                    'Committor Name': commit.committer.name,
-                    'Committor Email': commit.committer.email,
-                    'Author Date': commit.author_date,
-                    'Author Timezone': commit.author_timezone,                           
-                    'Committor Date': commit.committer_date,
-                    'Committor Timezone': commit.committer_timezone,
-                    'in_main_branch': commit.in_main_branch, # Arguably redundant given in_main_branch is always true
-                    'merge': commit.merge, # Arguably redundant given merge is always false
-                    'modified_files': [file.filename for file in commit.modified_files],
-                    'parents': commit.parents,
-                    'deletions': commit.deletions,
-                    'insertions': commit.insertions,
-                    'lines': commit.lines,
-                    'files': commit.files,
-                    'dmm_unit_size': commit.dmm_unit_size,
-                    'dmm_unit_complexity': commit.dmm_unit_complexity,
-                    'dmm_unit_interfacing': commit.dmm_unit_interfacing
-                }
-                    commits_data.append(commit_data)
-            except Exception as e:
-                print(f"Error reading commit {commit.hash}: {e}")
-                continue  # Skip the problematic commit and continue
-        print(f"Repository {repo_path} extracted successfully.\n")
-    except FileNotFoundError:
-        print(f"Repository {repo_path} not found. Skipping...")
-        return None
-    except Exception as e:
-        print(f"Error processing repository {repo_path}: {e}")
-        return None
-    return commits_data 
-
-#--------------------------------------------------------------------------------------------------------------
-
-# Plots of data
-
-def commits_by_authors(df, github_name):
-    plt.figure()
-
-    # Plot the number of commits per author (top 10)
-    df['Author Name'].value_counts()[:10].plot(kind='bar')
-
-    plt.xlabel('Author')
-    plt.ylabel('Number of Commits')
-    plt.title(f"Number of Commits per Author for {github_name}")
-    plt.xticks(rotation=45, ha='right')
-    plt.subplots_adjust(bottom=0.4)
-
-    plt.savefig(os.path.join(github_name, f"{github_name}_commits_per_author.png"), bbox_inches='tight')
-    print(f"Commits per author for {github_name} plotted successfully.")
-    plt.close() 
-
-def plot_commit_impact_by_top_authors(df, github_name):
-    plt.figure()
-
-    top_authors = df['Author Name'].value_counts().nlargest(10).index
-
-    # Filter the DataFrame to include only the top 10 contributors
-    top_authors_df = df[df['Author Name'].isin(top_authors)]
-
-    if len(top_authors) < 10:
-        amount_of_authours = len(top_authors)
+    # Giant histories are split into ranges of commits extracted by several processes (see ranges.py)
+    hashes = ranges.list_commits(repo_path, since_commit) if range_workers > 1 else []
+    if len(hashes) >= ranges.RANGE_MIN_COMMITS:
+        rows = ranges.extract_ranges(repo_path, fields, hashes, range_workers, cache)
+    # Only the non-merge history of HEAD (the default branch) is walked, so every commit is on the main
+    # branch and no per-commit in_main_branch (git branch --contains) or merge check is needed
+    elif since_commit is None:
+        rows = commit_rows(Repository(repo_path, only_no_merge=True).traverse_commits(), fields, cache)
     else:
-        amount_of_authours = 10
-
-    # Aggregate insertions and deletions for each of the top contributors
-    author_impact = top_authors_df.groupby('Author Name').agg({'insertions': 'sum', 'deletions': 'sum'})
-    author_impact.plot(kind='bar', stacked=True)
-
-    plt.xlabel('Author')
-    plt.ylabel('Lines Changed (Insertions + Deletions)')
-    plt.title(f"Commit Impact by Top {amount_of_authours} Authors for {github_name}")
-    plt.xticks(rotation=45, ha='right')
-    plt.subplots_adjust(bottom=0.4)
-
-    plt.savefig(os.path.join(github_name, f"{github_name}_commit_impact_by_top_authors.png"))
-    print(f"Commit Impact by Top {amount_of_authours} authors for {github_name} plotted successfully.")
-    plt.close()
-
+        # Incremental run: only the commits added since the previously extracted HEAD. pydriller's
+        # from_commit is not used as its --ancestry-path would miss commits of branches merged since
+        rows = commit_rows(Git(repo_path).get_list_commits(['HEAD', f'^{since_commit}'], no_merges=True), fields, cache)
+    yield from rows
+    if cache is not None and any(field in commit_cache.CACHED_FIELDS for field in fields):
+        print(f"Reused the columns of {cache.hits} commits from the commit cache ({cache.misses} extracted).")
+    print(f"Repository {repo_path} extracted successfully.\n")
 
 #--------------------------------------------------------------------------------------------------------------
 
@@ -184,6 +209,28 @@ def calculate_commit_scores(commit_message):
         }
 
 
+# Columnar version of calculate_commit_scores over a whole column of commit messages (same scores,
+# one vectorized pass instead of three Python calls and a dict per commit)
+
+def calculate_commit_scores_vectorized(commit_messages):
+    # str() of a missing message (an empty message read back from the CSV) is 'nan', as in calculate_commit_scores
+    messages = commit_messages.astype(object).fillna('nan').astype(str)
+
+    # The title is the first line; its length is the position of the first newline, if there is one
+    first_newline = messages.str.find('\n').to_numpy()
+    title_lengths = np.where(first_newline >= 0, first_newline, messages.str.len().to_numpy())
+    title_ends_with_dot = messages.str.match(r'[^\n]*\.(?:\n|$)').to_numpy(dtype=bool)
+    title_starts_with_capital = messages.str[:1].str.isupper().to_numpy(dtype=bool)
+
+    scores = pd.DataFrame({
+        'length_of_title': np.select(
+            [(title_lengths == 0) | (title_lengths > 72), title_lengths <= 10, title_lengths <= 30, title_lengths <= 50],
+            [1, 2, 3, 4], default=5),
+        'title_ends_with_dots': np.where(title_ends_with_dot, 2, 1),
+        'title_first_character_capital': np.where(title_starts_with_capital, 2, 1),
+    }, index=commit_messages.index)
+    scores['average_score'] = scores.sum(axis=1) / 3
+    return scores
 
 
 def gini_coefficient(commit_counts):
@@ -203,11 +250,9 @@ def gini_coefficient(commit_counts):
 
 
 
-def calculate_commit_frequency(df):
-    df['Author Date'] = pd.to_datetime(df['Author Date'], utc=True)
-
+def calculate_commit_frequency(commit_count, earliest_commit_date, latest_commit_date):
     # Calculate the total time span of the commits
-    time_span = df['Author Date'].max() - df['Author Date'].min()
+    time_span = latest_commit_date - earliest_commit_date
 
     # Calculate frequencies
     days = time_span.days
@@ -215,130 +260,649 @@ def calculate_commit_frequency(df):
     if days == 0:
         days = 1
 
-    commits_per_day = len(df) / days
+    commits_per_day = commit_count / days
     weeks = days / 7
     months = days / 30  # Approximation
-    commits_per_week = len(df) / weeks
-    commits_per_month = len(df) / months
+    commits_per_week = commit_count / weeks
+    commits_per_month = commit_count / months
 
     return commits_per_day, commits_per_week, commits_per_month
 
-def calculate_percentage_with_5_or_more_commits(df):
-    author_commit_counts = df['Author Name'].value_counts()
+def calculate_percentage_with_5_or_more_commits(author_commit_counts):
     contributors_with_5_or_more = author_commit_counts[author_commit_counts >= 5]
     percentage = (len(contributors_with_5_or_more) / len(author_commit_counts)) * 100
     return percentage
 
-#--------------------------------------------------------------------------------------------------------------
 
-# Main function to run the analysis on each repository
-def main():
-    print("----------------------------------------------------------------")
-    for repo_path in repo_paths:
-        github_name = extract_github_name(repo_path)
-        csv_filename = f"{github_name}_commits.csv"
-        analysis_csv_filename = f"{github_name}_analysis.csv"
-        csv_path = os.path.join(github_name, csv_filename)
-        analysis_csv_path = os.path.join(github_name, analysis_csv_filename)
-
-        if not os.path.exists(csv_path):
-            commits_data = extract_commits(repo_path)
-            if commits_data is None or len(commits_data) == 0:
-                print(f"Skipping repository {repo_path} due to errors or not found.")
-                print("----------------------------------------------------------------")
-                continue
-            
-            # Export data to CSV
-            if commits_data:
-                create_folder(github_name)
-                with open(csv_path, mode='w', newline='', encoding='utf-8') as file:
-                    writer = csv.DictWriter(file, fieldnames=commits_data[0].keys())
-                    writer.writeheader()
-                    writer.writerows(commits_data)
-                    print(f"Data exported to CSV successfully in {csv_path}.\n")
+# Running totals of a repository's commits, fed batch by batch while they are written (or while the commits CSV
+# is read back in chunks), from which the plots and the analysis record are produced. Only per-author totals are
+# kept, so memory grows with the number of authors rather than the number of commits
+
+class CommitMetrics:
+    def __init__(self):
+        self.commit_count = 0
+        self.author_commits = {} # In order of first commit, as value_counts() counts them
+        self.author_impact = {}
+        self.earliest_commit_date = None
+        self.latest_commit_date = None
+        self.line_sum = 0
+        self.line_count = 0
+        self.timezones = set()
+        self.score_sums = None
+        self.columns = set()
+
+    def add(self, commits):
+        # commits is a DataFrame of rows from the extractors or the commits CSV; absent columns are skipped
+        # so a partial extraction plan only fails when the analysis record is produced
+        self.commit_count += len(commits)
+        self.columns.update(commits.columns)
+
+        if 'Author Name' in commits:
+            # Nameless authors are not counted, as empty names read back from the CSV are missing values
+            authors = commits[commits['Author Name'].notna() & (commits['Author Name'] != '')]
+            for author, count in authors['Author Name'].value_counts(sort=False).items():
+                self.author_commits[author] = self.author_commits.get(author, 0) + count
+            if 'insertions' in commits and 'deletions' in commits:
+                impact = authors.groupby('Author Name', sort=False)[['insertions', 'deletions']].sum()
+                for author, insertions, deletions in impact.itertuples():
+                    total_insertions, total_deletions = self.author_impact.get(author, (0, 0))
+                    self.author_impact[author] = (total_insertions + insertions, total_deletions + deletions)
+
+        if 'Author Date' in commits and len(commits) > 0:
+            author_dates = pd.to_datetime(commits['Author Date'], utc=True)
+            if self.earliest_commit_date is None:
+                self.earliest_commit_date, self.latest_commit_date = author_dates.min(), author_dates.max()
             else:
-                print(f"No commit data extracted for {github_name}.")
-                continue
+                self.earliest_commit_date = min(self.earliest_commit_date, author_dates.min())
+                self.latest_commit_date = max(self.latest_commit_date, author_dates.max())
+
+        if 'lines' in commits:
+            self.line_sum += commits['lines'].sum()
+            self.line_count += commits['lines'].count()
+
+        if 'Author Timezone' in commits:
+            self.timezones.update(commits['Author Timezone'].dropna().unique())
+
+        if 'Commit Message' in commits:
+            # Empty messages are scored as the missing values they are read back from the CSV as ('nan'), so the
+            # record is the same whether the commits come from the extractors or from the commit file
+            messages = commits['Commit Message'].where(commits['Commit Message'] != '')
+            score_sums = calculate_commit_scores_vectorized(messages).sum()
+            self.score_sums = score_sums if self.score_sums is None else self.score_sums + score_sums
+
+    def author_commit_counts(self):
+        # Most commits first; authors with as many commits stay in the order of their first commit (a stable
+        # sort), which is also how value_counts() breaks ties
+        return pd.Series(self.author_commits, dtype='int64').sort_values(ascending=False, kind='stable')
+
+    def author_totals(self):
+        # Commits, insertions and deletions of every author (saved for plots.py)
+        author_totals = self.author_commit_counts().rename('Number of Commits').rename_axis('Author Name').to_frame()
+        if self.author_impact:
+            impact = pd.DataFrame.from_dict(self.author_impact, orient='index', columns=['insertions', 'deletions'])
+            author_totals = author_totals.join(impact)
+        return author_totals
+
+    def analysis_record(self, github_name):
+        missing_columns = {'Author Name', 'Author Date', 'Author Timezone', 'Commit Message', 'lines'} - self.columns
+        if missing_columns:
+            raise KeyError(f"Commit columns missing for the analysis: {', '.join(sorted(missing_columns))}")
+
+        # Calculate the Gini coefficient
+        author_commit_counts = self.author_commit_counts()
+        gini_index = gini_coefficient(author_commit_counts.values)
+
+        # Calculate commit frequency
+        cpd, cpw, cpm = calculate_commit_frequency(self.commit_count, self.earliest_commit_date, self.latest_commit_date)
+
+        # Commit message scores (the average score of a commit is the mean of its three scores)
+        average_scores = self.score_sums / self.commit_count
+        average_score = (self.score_sums['length_of_title'] + self.score_sums['title_ends_with_dots']
+                         + self.score_sums['title_first_character_capital']) / (3 * self.commit_count)
+
+        # Calculate the duration of project
+        duration = relativedelta(self.latest_commit_date, self.earliest_commit_date)
+
+        return {
+            'Project Name': github_name,
+            'Project Duration (Years and Months)': f"{duration.years} years and {duration.months} months",
+            'Gini Coefficient': gini_index,
+            'Number of Contributors': len(author_commit_counts),
+            'Average Commits per Day': cpd,
+            'Average Commits per Week': cpw,
+            'Average Commits per Month': cpm,
+            'Percentage with >= 5 Commits': calculate_percentage_with_5_or_more_commits(author_commit_counts),
+            'Average Commit Size': self.line_sum / self.line_count,
+            'Number of Unique Timezones': len(self.timezones),
+            'Average Title Length': average_scores['length_of_title'],
+            'Average Title Ends with Fullstop': average_scores['title_ends_with_dots'],
+            'Average Title First Character Capital': average_scores['title_first_character_capital'],
+            'Average Score': average_score
+            # Add additional analysis data as needed
+        }
+
+# Feed an existing commit file to the metrics in chunks of only the columns they read, without holding all its
+# rows in memory
+
+METRICS_CHUNK_SIZE = 50000
+METRICS_COLUMNS = ['Commit Message', 'Author Name', 'Author Date', 'Author Timezone', 'insertions', 'deletions', 'lines']
+
+def read_commit_metrics(commits_path):
+    metrics = CommitMetrics()
+    for chunk in commit_files.iter_commit_chunks(commits_path, METRICS_COLUMNS, METRICS_CHUNK_SIZE):
+        metrics.add(chunk)
+    return metrics
+
+#--------------------------------------------------------------------------------------------------------------
+
+# Failures while extracting a repository, with the error class recorded in the job manifest
+
+class ExtractionError(Exception):
+    def __init__(self, error_class, message):
+        super().__init__(message)
+        self.error_class = error_class
+
+def classify_git_error(stderr):
+    # Deleted, renamed-away or private repositories will never clone; anything else may be transient
+    missing_markers = ('repository not found', 'could not read username', 'does not exist', 'access denied')
+    if any(marker in stderr.lower() for marker in missing_markers):
+        return 'repo_missing'
+    return 'clone_error'
+
+
+# Extract the commits of a repository from a local copy (its mirror when a mirror store is used) straight into
+# its commit file. Returns the number of rows written and the HEAD that was traversed, so a later incremental
+# run can continue from it
+
+def extract_repo(repo_path, github_name, commits_path, backend='pydriller', fields=None, mirror_dir=None,
+                 since_commit=None, known_hashes=(), metrics=None, cache_path=None, exclusion_policy=None, range_workers=1):
+    extract = EXTRACTION_BACKENDS[backend]
+    try:
+        if mirror_dir is not None and is_remote(repo_path):
+            local_copy = open_mirror(repo_path, github_name, mirror_dir)
+        else:
+            local_copy = local_clone(repo_path)
+        with contextlib.ExitStack() as stack:
+            with timing.stage('clone'):
+                local_path = stack.enter_context(local_copy)
+            head = resolve_head(local_path)
+            if head == since_commit:
+                return 0, head
+            create_folder(github_name)
+            # Files excluded by the policy are not diffed by any git command of the extraction
+            stack.enter_context(exclusion.git_environment(exclusion_policy))
+            if cache_path is not None:
+                cache = commit_cache.open_cache(cache_path, exclusion.policy_key(exclusion_policy))
+                extract = functools.partial(extract, cache=stack.enter_context(cache))
+            if range_workers > 1:
+                extract = functools.partial(extract, range_workers=range_workers)
+            # Commits already on disk (e.g. of branches merged since the last run) are dropped
+            commits = (commit for commit in extract(local_path, fields, since_commit)
+                       if commit['Hash'] not in known_hashes)
+            commit_count = write_commits(commits_path, commits, fields, append=since_commit is not None, metrics=metrics)
+            if exclusion_policy is not None:
+                with timing.stage('count_excluded'):
+                    excluded = exclusion.count_excluded(local_path, exclusion_policy, since_commit)
+                timing.add_excluded(excluded)
+                print(f"Excluded from the diffs: {excluded['path']} file changes by path, {excluded['size']} by size.")
+    except FileNotFoundError:
+        raise ExtractionError('repo_missing', f"Repository {repo_path} not found")
+    except subprocess.CalledProcessError as e:
+        raise ExtractionError(classify_git_error(e.stderr), f"Error reading repository {repo_path}: {e.stderr.strip()}")
+    except MemoryError:
+        raise
+    except Exception as e:
+        raise ExtractionError('extraction_error', f"Error processing repository {repo_path}: {e}")
+    return commit_count, head
+
+
+# Record of the last extraction of a repository, used by incremental runs
+
+def write_repo_state(state_csv_path, head, commit_count):
+    state_data = {
+        'Head Hash': head,
+        'Extracted At': datetime.now(timezone.utc).isoformat(),
+        'Number of Commits': commit_count
+    }
+    with open(state_csv_path, mode='w', newline='', encoding='utf-8') as file:
+        writer = csv.DictWriter(file, fieldnames=state_data.keys())
+        writer.writeheader()
+        writer.writerow(state_data)
+
+def read_repo_state(state_csv_path):
+    if not os.path.exists(state_csv_path):
+        return None
+    with open(state_csv_path, newline='', encoding='utf-8') as file:
+        return next(csv.DictReader(file), None)
+
+# Writer of commit rows to a CSV file or, for a Parquet dataset, to a new part of it
+
+@contextlib.contextmanager
+def open_commit_writer(output_path, fieldnames, append, parquet):
+    if parquet:
+        with commit_files.ParquetCommitWriter(output_path, fieldnames) as writer:
+            yield writer
+        timing.add_bytes(writer.bytes_written)
+        return
+    with open(output_path, mode='w', newline='', encoding='utf-8') as file:
+        writer = csv.DictWriter(file, fieldnames=fieldnames)
+        # Appended rows go below the header of the existing file
+        if not append:
+            writer.writeheader()
+        yield writer
+        timing.add_bytes(file.tell())
+
+def remove_output(path):
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
+
+def partial_path(commits_path):
+    # Each writer has a partial file of its own, so two processes writing the same commit file can't clobber each
+    # other's rows
+    return f"{commits_path}.{os.getpid()}.partial"
+
+def remove_stale_partials(commits_path):
+    # Partial files left behind by writers that are gone
+    for path in glob.glob(glob.escape(commits_path) + '.*.partial'):
+        try:
+            os.kill(int(path[len(commits_path) + 1:-len('.partial')]), 0)
+        except ProcessLookupError:
+            remove_output(path)
+        except (PermissionError, ValueError):
+            pass
+
+def append_file(source_path, target_path):
+    # One copy of the complete rows; when it is interrupted, the target is cut back to where it ended
+    with open(source_path, 'rb') as source, open(target_path, 'ab') as target:
+        end_offset = target.tell()
+        try:
+            shutil.copyfileobj(source, target)
+        except BaseException:
+            target.truncate(end_offset)
+            raise
+    os.remove(source_path)
+
+# Write commit rows in bounded batches as they are extracted. A new file, or the rows appended to an existing
+# CSV file, are written next to the final path and only moved (or added) to it once complete, so an interrupted
+# run never leaves a truncated row behind. Parquet datasets take appended rows as a part of their own
+
+COMMIT_BATCH_SIZE = 1000
+
+def write_commits(commits_path, commits, fieldnames, append=False, metrics=None):
+    parquet = commit_files.is_parquet(commits_path)
+    output_path = commits_path if append and parquet else partial_path(commits_path)
+    commit_count = 0
+    try:
+        with open_commit_writer(output_path, fieldnames, append, parquet) as writer:
+            while True:
+                # Pulling a batch runs the traversal (and diffs) of the extraction backend
+                with timing.stage('extract'):
+                    batch = list(itertools.islice(commits, COMMIT_BATCH_SIZE))
+                if not batch:
+                    break
+                with timing.stage('write_commits'):
+                    writer.writerows(batch)
+                if metrics is not None:
+                    with timing.stage('metrics'):
+                        metrics.add(pd.DataFrame(batch, columns=fieldnames))
+                commit_count += len(batch)
+                isolation.report_progress(len(batch))
+            timing.add_commits(commit_count)
+    except BaseException:
+        if output_path != commits_path:
+            remove_output(output_path)
+        raise
+    if output_path != commits_path:
+        if commit_count == 0:
+            remove_output(output_path)
+        elif append:
+            append_file(output_path, commits_path)
         else:
-            print(f"CSV file {csv_path} already exists. Skipping data extraction.\n")
+            os.replace(output_path, commits_path)
+    return commit_count
+
+
+# Extract only the commits added since the last run and append them to the existing commit file.
+# Returns False when there is nothing new to analyse
+
+def update_commits(repo_path, github_name, commits_path, state_csv_path, analysis_csv_path, backend, mirror_dir,
+                   cache_path=None, exclusion_policy=None, range_workers=1):
+    # Keep the columns of the existing file so the appended rows line up with them
+    fields = commit_files.commit_fields(commits_path)
+    known_hashes = commit_files.read_commits(commits_path, ['Hash'])['Hash']
+
+    state = read_repo_state(state_csv_path)
+    if state is not None:
+        since_commit = state['Head Hash']
+    elif len(known_hashes) > 0:
+        since_commit = known_hashes.iloc[-1] # Extracted before states were recorded
+    else:
+        since_commit = None
+
+    commit_count, head = extract_repo(repo_path, github_name, commits_path, backend, fields, mirror_dir,
+                                      since_commit, set(known_hashes), cache_path=cache_path,
+                                      exclusion_policy=exclusion_policy, range_workers=range_workers)
+    write_repo_state(state_csv_path, head, len(known_hashes) + commit_count)
+    print(f"Appended {commit_count} new commits to {commits_path}.\n")
+    return commit_count > 0 or not os.path.exists(analysis_csv_path)
+
+
+# Mine a single repository: extract its commits (or only the new ones when incremental) and analyse them.
+# Returns the outcome recorded in the job manifest
+
+def process_repo(repo_path, backend='pydriller', fields=None, mirror_dir=None, incremental=False, output_format='csv',
+                 cache_path=None, exclusion_policy=None, range_workers=1):
+    if fields is None:
+        fields = extraction_plan()
+    github_name = extract_github_name(repo_path)
+    # A repository already extracted keeps the format it was written in
+    commits_path = (commit_files.find_commits_path(github_name, github_name)
+                    or commit_files.commits_path(github_name, output_format))
+    analysis_csv_filename = f"{github_name}_analysis.csv"
+    state_csv_filename = f"{github_name}_state.csv"
+    analysis_csv_path = os.path.join(github_name, analysis_csv_filename)
+    state_csv_path = os.path.join(github_name, state_csv_filename)
+    result = {'repo': repo_path, 'status': 'done', 'error_class': None, 'error_message': None,
+              'commits_csv': commits_path, 'analysis_csv': analysis_csv_path}
+
+    # Stage timings of the repository travel back with its result
+    timing.start()
+    try:
+        metrics = None
+        try:
+            if not os.path.exists(commits_path):
+                # Export data while it is extracted, and total up the metrics along the way
+                metrics = CommitMetrics()
+                commit_count, head = extract_repo(repo_path, github_name, commits_path, backend, fields, mirror_dir,
+                                                  metrics=metrics, cache_path=cache_path,
+                                                  exclusion_policy=exclusion_policy, range_workers=range_workers)
+                if commit_count == 0:
+                    raise ExtractionError('empty', f"No commits extracted from {repo_path}")
+                write_repo_state(state_csv_path, head, commit_count)
+                print(f"Data exported successfully in {commits_path}.\n")
+            elif incremental:
+                if not update_commits(repo_path, github_name, commits_path, state_csv_path, analysis_csv_path, backend,
+                                      mirror_dir, cache_path, exclusion_policy, range_workers):
+                    print(f"No new commits for {github_name}. Skipping analysis.")
+                    print("----------------------------------------------------------------")
+                    result.update(status='skipped')
+                    return result
+            else:
+                print(f"Commit file {commits_path} already exists. Skipping data extraction.\n")
+        except ExtractionError as e:
+            print(f"{e}. Skipping repository {repo_path}.")
+            print("----------------------------------------------------------------")
+            result.update(status='failed', error_class=e.error_class, error_message=str(e))
+            return result
+        # Commits in the commit file, also after appending to it or reusing it (scheduling estimates of later runs)
+        state = read_repo_state(state_csv_path)
+        result['commit_count'] = int(state['Number of Commits']) if state is not None else None
 
         # Try to perform analysis on the commits data
         try:
             print(f"Starting data analysis for {github_name}...\n")
-            df = pd.read_csv(csv_path)
-            perform_analysis(df, github_name, analysis_csv_path)
+            if metrics is None:
+                # Existing (or appended to) commit file
+                with timing.stage('read_commits'):
+                    metrics = read_commit_metrics(commits_path)
+            perform_analysis(metrics, github_name, analysis_csv_path)
+        except MemoryError:
+            raise
         except Exception as e:
             print(f"Error during analysis of {github_name}: {e}")
-        
+            result.update(status='failed', error_class='analysis_error', error_message=str(e))
+
         print("----------------------------------------------------------------")
+        return result
+    finally:
+        result['timings'] = timing.finish()
 
 
-def perform_analysis(df, github_name, analysis_csv_path):
+# Mine a repository in an isolated, killable process when a time or memory budget is set. A killed
+# extraction leaves its partial commit file behind, which is removed here
 
-    commits_by_authors(df, github_name)
-    plot_commit_impact_by_top_authors(df, github_name)
+def process_repo_isolated(repo_path, mine_repo, time_limit=None, memory_limit=None):
+    result = isolation.run_isolated(mine_repo, repo_path, time_limit, memory_limit)
+    result.setdefault('repo', repo_path)
+    if result['status'] == 'failed':
+        github_name = extract_github_name(repo_path)
+        for output_format in commit_files.OUTPUT_FORMATS:
+            remove_stale_partials(commit_files.commits_path(github_name, output_format))
+    return result
+
+
+# Commit extraction backends selectable with --backend; all are generators of the same commit dicts
+
+EXTRACTION_BACKENDS = {
+    'pydriller': extract_commits,
+    'git-log': extract_commits_git_log,
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Mine commit history and contribution metrics from GitHub repositories.')
+    parser.add_argument('seed_files', nargs='+', help='Seed CSV files (Set_*.csv shards or github_top800.csv), or a seed manifest compiled by seeds.py')
+    parser.add_argument('--start', type=int, default=0, help='Index of the first repository to mine (inclusive)')
+    parser.add_argument('--end', type=int, default=None, help='Index of the last repository to mine (exclusive)')
+    parser.add_argument('--backend', choices=EXTRACTION_BACKENDS.keys(), default='pydriller',
+                        help="Commit extraction backend ('git-log' streams one git log per repository and skips the dmm metrics)")
+    parser.add_argument('--steps', nargs='+', choices=STEP_FIELDS.keys(), default=None,
+                        help='Downstream steps whose commit columns are extracted (default: all analysis and score steps, '
+                             'and the warehouse steps with --warehouse)')
+    parser.add_argument('--fields', nargs='+', choices=COMMIT_FIELDS.keys(), default=[],
+                        help='Additional commit columns to extract, e.g. the opt-in dmm_unit_* metrics')
+    parser.add_argument('--output-format', choices=commit_files.OUTPUT_FORMATS, default='csv',
+                        help="Format of new commit files ('parquet' writes typed columns and needs pyarrow)")
+    parser.add_argument('--store', default=None,
+                        help='Dataset store to move every mined repository into, partitioned by seed shard (see store.py)')
+    parser.add_argument('--store-hash-prefix', type=int, default=0,
+                        help='Further partition the store by this many hex characters of the hash of the repository name')
+    parser.add_argument('--warehouse', default=None,
+                        help='SQLite warehouse to load the commits and analysis record of every mined repository into (see warehouse.py)')
+    parser.add_argument('--mirror-dir', default=None,
+                        help='Directory of persistent bare mirrors; repositories are cloned once and only fetched afterwards')
+    parser.add_argument('--mirror-max-size', type=float, default=None,
+                        help='Size budget of the mirror directory in GB; least recently used mirrors are evicted beyond it')
+    parser.add_argument('--commit-cache', default=None,
+                        help='SQLite cache of the diff stats and dmm metrics of every extracted commit, keyed by hash, and of the '
+                             'risk profiles of blobs behind the dmm metrics; reused by forks and copies containing the same '
+                             'commits or files (see commit_cache.py)')
+    parser.add_argument('--exclude-paths', nargs='*', default=None,
+                        help='Paths (gitattributes patterns) whose changes are not diffed, so they add no lines; without '
+                             'patterns, common vendored, lockfile, minified, notebook and data dump paths (see exclusion.py)')
+    parser.add_argument('--max-diff-size', type=float, default=None,
+                        help='Size in MB above which changed files are not diffed, like binary files')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Append only the commits added since the last run to existing commit CSVs and re-analyse them')
+    parser.add_argument('--manifest', default=None,
+                        help='SQLite job manifest, or http://<host>:<port> of a manifest served by manifest.py serve to share '
+                             'with other machines; runs resume from it, retry transient failures and skip broken repositories')
+    parser.add_argument('--requeue', action='store_true',
+                        help='Put the done manifest jobs of the seed range back to pending before mining, so an --incremental '
+                             'run appends their new commits; given once per run, not by workers joining it later')
+    parser.add_argument('--timeout', type=float, default=None,
+                        help='Wall-clock budget per repository in seconds; overruns are killed and recorded as timed out')
+    parser.add_argument('--max-memory', type=float, default=None,
+                        help='Memory (address space) budget per repository in GB')
+    parser.add_argument('--timings', default=None,
+                        help='JSON lines file to append the stage timings of every repository to (summarise with timing.py)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Number of repositories mined in parallel')
+    parser.add_argument('--range-workers', type=int, default=1,
+                        help=f'Processes extracting the history of a repository of at least {ranges.RANGE_MIN_COMMITS} commits '
+                             'in parallel ranges, merged back in order (default: 1, traversed serially)')
+    parser.add_argument('--small-lane-workers', type=int, default=None,
+                        help='Workers that take the smallest repositories first while the others take the largest '
+                             '(default: a quarter of --workers; 0 schedules every worker longest first)')
+    parser.add_argument('--no-size-probe', action='store_true',
+                        help='Do not ask the GitHub API for the size of remote repositories that no previous run, '
+                             'mirror or local copy gives an estimate for (they are then scheduled at the median estimate)')
+    args = parser.parse_args()
+    if args.exclude_paths == []:
+        args.exclude_paths = exclusion.DEFAULT_EXCLUDED_PATHS
+    if args.small_lane_workers is None:
+        args.small_lane_workers = args.workers // 4
+    if args.store is not None and args.incremental:
+        parser.error('--store keeps no per-repository folders to update; run --incremental without it')
+    if args.requeue and (args.manifest is None or not args.incremental):
+        parser.error('--requeue applies to --incremental runs with a --manifest')
+    if args.commit_cache is not None and args.backend != 'pydriller':
+        parser.error('--commit-cache applies to the pydriller backend; git log computes the diffs of all commits in one pass')
+    if args.range_workers > 1 and args.backend != 'pydriller':
+        parser.error('--range-workers applies to the pydriller backend; git log streams the whole history in one process')
+    if args.output_format == 'parquet' and not commit_files.parquet_available():
+        parser.error('--output-format parquet needs pyarrow (pip install pyarrow)')
+    return args
+
+
+# Evict the least recently used mirrors once the mirror directory is over its size budget
+
+MIRROR_EVICTION_INTERVAL = 100 # Repositories mined between two eviction passes
+
+def enforce_mirror_budget(mirror_dir, mirror_max_size, count=0):
+    if mirror_dir is not None and mirror_max_size is not None and count % MIRROR_EVICTION_INTERVAL == 0:
+        evict_mirrors(mirror_dir, mirror_max_size * 1e9)
+
+
+# Bookkeeping after each mined repository: loading it into the warehouse, moving it into the dataset store, its
+# timing record and the mirror store budget. A repository that could not be loaded into the warehouse is recorded
+# as failed (retried by a manifest) and kept in its folder for the retry
+
+def after_repo(args, repo_shards, repo_path, result, count=0):
+    if args.warehouse is not None and result['status'] == 'done':
+        try:
+            warehouse.load_repo_folder(args.warehouse, extract_github_name(repo_path))
+        except Exception as e:
+            print(f"Error loading {repo_path} into the warehouse {args.warehouse}: {e}")
+            result.update(status='failed', error_class='warehouse_error', error_message=str(e))
+    if args.store is not None and result['status'] == 'done':
+        try:
+            store.add_repo(args.store, repo_path, extract_github_name(repo_path), repo_shards.get(repo_path, 'unknown'),
+                           args.store_hash_prefix)
+        except Exception as e:
+            print(f"Error adding {repo_path} to the store {args.store}: {e}")
+    if args.timings is not None:
+        timing.write_record(args.timings, repo_path, result)
+    enforce_mirror_budget(args.mirror_dir, args.mirror_max_size, count)
+
+
+# Mine the repositories through the job manifest: each worker process claims pending jobs until none are left.
+# The manifest is a local file or the address of a coordinator (manifest.py serve) shared with other machines
+
+MANIFEST_BATCH_SIZE = 10000 # Jobs added per call, so a coordinator is not sent the whole seed range at once
+
+def run_manifest(args, repo_paths, repo_shards, costs, mine_repo):
+    queue = manifest.open_queue(args.manifest)
+    jobs = [(repo_path, extract_github_name(repo_path), args.start + index, costs[repo_path])
+            for index, repo_path in enumerate(repo_paths)]
+    for batch_start in range(0, len(jobs), MANIFEST_BATCH_SIZE):
+        batch = jobs[batch_start:batch_start + MANIFEST_BATCH_SIZE]
+        queue.add_jobs(batch)
+        if args.requeue:
+            print(f"Requeued {queue.requeue_done([job[0] for job in batch])} done jobs.")
+    # Jobs of this machine's dead workers are released now rather than when their lease runs out
+    queue.reset_interrupted(manifest.dead_local_workers(queue.running_workers()))
+    print(f"Manifest {args.manifest}: {queue.job_counts()}")
+    if args.incremental and not args.requeue:
+        print("Done jobs are only mined again once requeued (--requeue, or manifest.py requeue).")
+
+    after_job = functools.partial(after_repo, args, repo_shards)
+    worker = functools.partial(manifest.run_worker, args.manifest, mine_repo, after_job)
+    if args.workers <= 1:
+        worker()
+    else:
+        # Separate processes rather than a pool, so one worker dying doesn't stall the others; its job is
+        # reassigned once its lease runs out
+        processes = [multiprocessing.Process(target=worker, kwargs={'lane': schedule.lane_of(index, args.small_lane_workers)})
+                     for index in range(args.workers)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
 
-    # Calculate the Gini coefficient
-    author_commit_counts = df['Author Name'].value_counts().values
-    gini_index = gini_coefficient(author_commit_counts)
-    # print(f"The Gini coefficient for commits per author in {github_name} is: {gini_index}")
+    print(f"Manifest {args.manifest}: {queue.job_counts()}")
+    queue.close()
 
-    # Calculate the number of unique contributors
-    num_contributors = df['Author Name'].nunique()
-    # print(f"Number of unique contributors in {github_name}: {num_contributors}")
-    
-    # Calculate commit frequency
-    cpd, cpw, cpm = calculate_commit_frequency(df)
-    # print(f"Average commits per day in {github_name}: {cpd:.2f}")
-    # print(f"Average commits per week in {github_name}: {cpw:.2f}")
-    # print(f"Average commits per month in {github_name}: {cpm:.2f}")
 
-    # Calculate the percentage of contributors with 5 or more commits
-    perc_with_5_or_more = calculate_percentage_with_5_or_more_commits(df)
-    # print(f"Percentage of contributors with 5 or more commits in {github_name}: {perc_with_5_or_more:.2f}%\n")
+# Main function to run the analysis on each repository
+def main():
+    args = parse_args()
+    repo_paths, repo_shards = load_seeds(args.seed_files, args.start, args.end)
+    if args.store is not None:
+        stored_names = set(store.list_repos(args.store)['github_name']) if store.is_store(args.store) else set()
+        remaining_paths = [repo_path for repo_path in repo_paths if extract_github_name(repo_path) not in stored_names]
+        print(f"Skipping {len(repo_paths) - len(remaining_paths)} repositories already in the store {args.store}.")
+        repo_paths = remaining_paths
+    print(f"Mining {len(repo_paths)} repositories with {args.workers} workers.")
+    print("----------------------------------------------------------------")
 
-    # Average Commit Size
-    average_commit_size = (df['lines']).mean()
-    # print(f"Average commit size in {github_name}: {average_commit_size:.2f}")
+    fields = extraction_plan(args.steps, args.fields, warehouse=args.warehouse is not None)
+    print(f"Extracting commit columns: {', '.join(fields)}")
+    exclusion_policy = exclusion.exclusion_policy(args.exclude_paths,
+                                                  int(args.max_diff_size * 1e6) if args.max_diff_size is not None else None)
+    mine_repo = functools.partial(process_repo, backend=args.backend, fields=fields, mirror_dir=args.mirror_dir,
+                                  incremental=args.incremental, output_format=args.output_format,
+                                  cache_path=args.commit_cache, exclusion_policy=exclusion_policy,
+                                  range_workers=args.range_workers)
+    isolated = args.timeout is not None or args.max_memory is not None
+    if isolated:
+        memory_limit = int(args.max_memory * 1e9) if args.max_memory is not None else None
+        mine_repo = functools.partial(process_repo_isolated, mine_repo=mine_repo, time_limit=args.timeout,
+                                      memory_limit=memory_limit)
+
+    costs = schedule.estimate_costs(repo_paths, [extract_github_name(repo_path) for repo_path in repo_paths],
+                                    args.mirror_dir, args.manifest, args.timings, args.store, not args.no_size_probe)
+    enforce_mirror_budget(args.mirror_dir, args.mirror_max_size)
+    if args.manifest is not None:
+        run_manifest(args, repo_paths, repo_shards, costs, mine_repo)
+        enforce_mirror_budget(args.mirror_dir, args.mirror_max_size)
+        if args.store is not None:
+            store.compact(args.store)
+        return
+
+    # Each worker mines one repository at a time; a fresh process every few repos keeps memory bounded.
+    # Isolated repositories already run in their own process, so threads are enough to supervise them
+    if args.workers <= 1:
+        pool = None
+    elif isolated:
+        pool = multiprocessing.pool.ThreadPool(processes=args.workers)
+    else:
+        pool = multiprocessing.Pool(processes=args.workers, maxtasksperchild=50)
+    # Longest first, with a lane of workers taking the small repositories (see schedule.py)
+    if pool:
+        results = schedule.dispatch(pool, mine_repo, repo_paths, costs, args.workers, args.small_lane_workers)
+    else:
+        results = map(mine_repo, repo_paths)
+    try:
+        for count, result in enumerate(results, 1):
+            after_repo(args, repo_shards, result['repo'], result, count)
+        enforce_mirror_budget(args.mirror_dir, args.mirror_max_size)
+        if args.store is not None:
+            store.compact(args.store)
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
 
-    # Count the number of unique timezones
-    unique_timezones_count = df['Author Timezone'].nunique()
-    # print(f"Number of unique timezones: {unique_timezones_count}")
 
-    # # Calculate commit message scores
-    commit_scores = df['Commit Message'].apply(calculate_commit_scores)
-    scores_df = pd.DataFrame(list(commit_scores))
-    average_scores = scores_df.mean()
+def perform_analysis(metrics, github_name, analysis_csv_path):
 
-    # Calculate the duration of project
-    earliest_commit_date = df['Author Date'].min()
-    latest_commit_date = df['Author Date'].max()
-    duration = relativedelta(latest_commit_date, earliest_commit_date)
+    # Author totals for the charts, which plots.py renders as a separate stage
+    authors_csv_path = os.path.join(github_name, f"{github_name}_authors.csv")
+    with timing.stage('write_authors'):
+        metrics.author_totals().to_csv(authors_csv_path)
+    timing.add_bytes(os.path.getsize(authors_csv_path))
 
     # Prepare data for analysis CSV
-    analysis_data = {
-        'Project Name': github_name,
-        'Project Duration (Years and Months)': f"{duration.years} years and {duration.months} months",
-        'Gini Coefficient': gini_index,
-        'Number of Contributors': num_contributors,
-        'Average Commits per Day': cpd,
-        'Average Commits per Week': cpw,
-        'Average Commits per Month': cpm,
-        'Percentage with >= 5 Commits': perc_with_5_or_more,
-        'Average Commit Size': average_commit_size,
-        'Number of Unique Timezones': unique_timezones_count,
-        'Average Title Length': average_scores['length_of_title'],
-        'Average Title Ends with Fullstop': average_scores['title_ends_with_dots'],
-        'Average Title First Character Capital': average_scores['title_first_character_capital'],
-        'Average Score': average_scores['average_score']
-        # Add additional analysis data as needed
-    }
+    analysis_data = metrics.analysis_record(github_name)
 
     # Write analysis data to a new CSV file
-    with open(analysis_csv_path, mode='w', newline='', encoding='utf-8') as file:
+    with timing.stage('write_analysis'), open(analysis_csv_path, mode='w', newline='', encoding='utf-8') as file:
         writer = csv.DictWriter(file, fieldnames=analysis_data.keys())
         writer.writeheader()
         writer.writerow(analysis_data)
+        timing.add_bytes(file.tell())
         print(f"Analysis data exported to CSV successfully in {analysis_csv_path}") 
 
 # # Run the script
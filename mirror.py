@@ -0,0 +1,346 @@
+# Persistent store of bare repository mirrors keyed by the canonical GitHub name (extract_github_name).
+# The first run clones each repository, later runs only fetch the new commits, and the least recently
+# used mirrors are evicted once the store grows past its size budget.
+#
+# Forks share their history through object pools (<mirror_dir>/pools/<owner>-<name>.git, one per fork network,
+# named after the repository the network grows from as the GitHub API reports it; a repository the API cannot
+# place gets a pool of its own). A mirror is cloned with --reference-if-able to its pool, so only the objects
+# the pool lacks are downloaded, and once its roots show it shares history with the pool its branches are
+# fetched into the pool and the mirror is repacked down to the objects it cannot borrow (git alternates).
+# Pools are repacked once enough loose objects or packs have piled up in them.
+
+from contextlib import ExitStack, contextmanager
+import fcntl
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import urllib.error
+import urllib.request
+
+SIZE_FILE = 'mirror-size'
+POOL_DIR = 'pools'
+ROOTS_FILE = 'pool-roots' # Root commits of the histories in a pool
+POOL_MAX_LOOSE_OBJECTS = 5000 # A pool is repacked once it has more loose objects or packs than this
+POOL_MAX_PACKS = 20
+GITHUB_API_URL = 'https://api.github.com/repos'
+API_TIMEOUT = 10 # Seconds per request
+
+#--------------------------------------------------------------------------------------------------------------
+
+# Helper Functions
+
+def is_remote(repo_path):
+    return repo_path.startswith(('git@', 'https://', 'http://', 'git://', 'file://'))
+
+def mirror_path(mirror_dir, github_name):
+    return os.path.join(mirror_dir, f"{github_name}.git")
+
+def lock_path(mirror_dir, github_name):
+    # Kept next to the mirror; its mtime records when the mirror was last used
+    return os.path.join(mirror_dir, f"{github_name}.lock")
+
+def run_git(args):
+    return subprocess.run(['git', *args], check=True, capture_output=True, text=True)
+
+def resolve_head(repo_dir):
+    return run_git(['-C', repo_dir, 'rev-parse', 'HEAD']).stdout.strip()
+
+def github_repo(repo_url):
+    # 'owner/name' of a github.com URL, or None
+    parts = repo_url.rstrip('/').split('/')
+    if 'github.com' not in parts or len(parts) < parts.index('github.com') + 3:
+        return None
+    index = parts.index('github.com')
+    return f"{parts[index + 1]}/{parts[index + 2].removesuffix('.git')}"
+
+def github_metadata(repo):
+    # The GitHub API's record of 'owner/name' (authenticated with GITHUB_TOKEN if it is set), or None if it cannot
+    # be had. Raises HTTPError once the rate limit is exhausted, so callers can stop asking
+    request = urllib.request.Request(f"{GITHUB_API_URL}/{repo}", headers={'Accept': 'application/vnd.github+json'})
+    if os.environ.get('GITHUB_TOKEN'):
+        request.add_header('Authorization', f"Bearer {os.environ['GITHUB_TOKEN']}")
+    try:
+        with urllib.request.urlopen(request, timeout=API_TIMEOUT) as response:
+            return json.load(response)
+    except urllib.error.HTTPError as e:
+        if e.code in (403, 429):
+            raise
+        return None
+    except (OSError, ValueError):
+        return None
+
+def directory_size(path):
+    total = 0
+    for root, dirs, files in os.walk(path):
+        for file in files:
+            try:
+                total += os.path.getsize(os.path.join(root, file))
+            except OSError:
+                pass
+    return total
+
+def record_size(path):
+    with open(os.path.join(path, SIZE_FILE), 'w') as f:
+        f.write(str(directory_size(path)))
+
+def read_size(path):
+    try:
+        with open(os.path.join(path, SIZE_FILE)) as f:
+            return int(f.read())
+    except (OSError, ValueError):
+        return directory_size(path)
+
+#--------------------------------------------------------------------------------------------------------------
+
+# Object pools shared by the mirrors of forks
+
+def network_root(repo_url):
+    # 'owner/name' of the repository the fork network of repo_url grows from (the 'source' of a fork, the
+    # repository itself otherwise), or None if the GitHub API cannot tell
+    repo = github_repo(repo_url)
+    if repo is None:
+        return None
+    try:
+        metadata = github_metadata(repo)
+    except urllib.error.HTTPError:
+        return None
+    if not isinstance(metadata, dict):
+        return None
+    return metadata.get('source', metadata).get('full_name')
+
+def pool_path(mirror_dir, repo_url, github_name):
+    # Forks of one repository share its pool whatever they are named; without the API's answer a repository
+    # gets a pool of its own (named as its source would be), so unrelated repositories of one name never share
+    root = network_root(repo_url)
+    name = root.replace('/', '-') if root is not None else github_name
+    return os.path.abspath(os.path.join(mirror_dir, POOL_DIR, f"{name.lower()}.git"))
+
+def pool_of(path):
+    # The pool a mirror borrows objects from, if any
+    try:
+        with open(os.path.join(path, 'objects', 'info', 'alternates')) as f:
+            objects_dir = f.readline().strip()
+    except OSError:
+        return None
+    return os.path.dirname(objects_dir) if objects_dir else None
+
+@contextmanager
+def locked_pool(pool):
+    # Exclusive while a member is cloned into or moved into the pool, or the pool is evicted
+    os.makedirs(os.path.dirname(pool), exist_ok=True)
+    with open(pool[:-len('.git')] + '.lock', 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if not os.path.isdir(pool):
+            run_git(['init', '--quiet', '--bare', pool])
+            # No automatic gc: its members borrow its objects without the pool knowing (see repack_pool)
+            run_git(['-C', pool, 'config', 'gc.auto', '0'])
+        yield pool
+
+def root_commits(repo_dir):
+    try:
+        return set(run_git(['-C', repo_dir, 'rev-list', '--max-parents=0', '--all']).stdout.split())
+    except subprocess.CalledProcessError:
+        return set()
+
+def read_roots(pool):
+    try:
+        with open(os.path.join(pool, ROOTS_FILE)) as f:
+            return set(f.read().split())
+    except OSError:
+        return set()
+
+def share_objects(path, pool, github_name):
+    # Moves the objects of a mirror into the pool (called with both locked). A mirror whose history turns out to
+    # be unrelated to the pool's (another project of the same name) keeps objects of its own instead
+    roots = read_roots(pool)
+    if pool_of(path) is None or (roots and not roots & root_commits(path)):
+        if pool_of(path) is not None:
+            run_git(['-C', path, 'repack', '-a', '-d', '-q'])
+            os.remove(os.path.join(path, 'objects', 'info', 'alternates'))
+        return False
+    run_git(['-C', pool, 'fetch', '--quiet', '--no-tags', os.path.abspath(path), f"+refs/heads/*:refs/members/{github_name}/heads/*"])
+    if not roots:
+        with open(os.path.join(pool, ROOTS_FILE), 'w') as f:
+            f.write('\n'.join(sorted(root_commits(path))))
+    # -l leaves out every object the pool has
+    run_git(['-C', path, 'repack', '-a', '-d', '-l', '-q'])
+    if needs_repack(pool):
+        repack_pool(pool, github_name)
+    return True
+
+def members_of(pool):
+    # github_names of the mirrors borrowing from a pool (pools live in <mirror_dir>/pools)
+    mirror_dir = os.path.dirname(os.path.dirname(pool))
+    return [entry.name[:-len('.git')] for entry in os.scandir(mirror_dir)
+            if entry.name.endswith('.git') and pool_of(entry.path) == pool]
+
+def needs_repack(pool):
+    output = run_git(['-C', pool, 'count-objects', '-v']).stdout
+    fields = dict(line.split(': ', 1) for line in output.splitlines() if ': ' in line)
+    return int(fields.get('count', 0)) > POOL_MAX_LOOSE_OBJECTS or int(fields.get('packs', 0)) > POOL_MAX_PACKS
+
+def repack_pool(pool, locked_member=None):
+    # Packs a pool into one pack (called with the pool locked). Its members borrow objects the pool only keeps
+    # through their refs/members/* refs, so those are first brought up to date from every member; when a member
+    # is busy (being fetched) its refs may be behind, and nothing unreachable is dropped then (-k)
+    mirror_dir = os.path.dirname(os.path.dirname(pool))
+    keep_unreachable = False
+    with ExitStack() as locks:
+        for github_name in members_of(pool):
+            if github_name == locked_member:
+                continue  # Its branches were just fetched into the pool, under its lock
+            lock = locks.enter_context(open(lock_path(mirror_dir, github_name), 'a'))
+            try:
+                fcntl.flock(lock, fcntl.LOCK_SH | fcntl.LOCK_NB)
+                run_git(['-C', pool, 'fetch', '--quiet', '--no-tags', '--prune', mirror_path(mirror_dir, github_name),
+                         f"+refs/heads/*:refs/members/{github_name}/heads/*"])
+            except (BlockingIOError, subprocess.CalledProcessError):
+                keep_unreachable = True
+        run_git(['-C', pool, 'repack', '-a', '-d', '-q', *(['-k'] if keep_unreachable else [])])
+        if not keep_unreachable:
+            # Loose objects repack leaves behind are unreachable from every member too
+            run_git(['-C', pool, 'prune', '--expire=now'])
+
+def drop_member(pool, github_name):
+    refs = run_git(['-C', pool, 'for-each-ref', '--format=%(refname)', f"refs/members/{github_name}/"]).stdout.split()
+    if refs:
+        subprocess.run(['git', '-C', pool, 'update-ref', '--stdin'], input=''.join(f"delete {ref}\n" for ref in refs),
+                       check=True, capture_output=True, text=True)
+
+#--------------------------------------------------------------------------------------------------------------
+
+# Cloning and fetching
+
+def clone_mirror(repo_url, path, reference=None):
+    # Clone next to the final location so an interrupted clone never looks like a usable mirror
+    partial_path = path + '.partial'
+    shutil.rmtree(partial_path, ignore_errors=True)
+    reference_args = ['--reference-if-able', reference] if reference is not None else []
+    run_git(['clone', '--quiet', '--bare', *reference_args, repo_url, partial_path])
+    # Only branches are mirrored (a plain --mirror would also pull every refs/pull/* ref from GitHub)
+    run_git(['-C', partial_path, 'config', 'remote.origin.fetch', '+refs/heads/*:refs/heads/*'])
+    os.rename(partial_path, path)
+
+def fetch_mirror(path):
+    run_git(['-C', path, 'fetch', '--quiet', '--prune', 'origin'])
+
+@contextmanager
+def open_mirror(repo_url, github_name, mirror_dir):
+    os.makedirs(mirror_dir, exist_ok=True)
+    path = mirror_path(mirror_dir, github_name)
+    with open(lock_path(mirror_dir, github_name), 'a') as lock:
+        # Exclusive while cloning or fetching, shared while the mirror is being traversed
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if os.path.isdir(path):
+            print(f"Fetching new commits for {repo_url} into {path}...")
+            try:
+                fetch_mirror(path)
+                pool = pool_of(path)
+                if pool is not None:
+                    with locked_pool(pool):
+                        share_objects(path, pool, github_name)
+            except subprocess.CalledProcessError as e:
+                print(f"Error fetching {repo_url}, using the existing mirror: {e.stderr.strip()}")
+        else:
+            print(f"Cloning {repo_url} into {path}...")
+            # The pool is held through the clone, so a fork cloned meanwhile waits and borrows this one's objects
+            with locked_pool(pool_path(mirror_dir, repo_url, github_name)) as pool:
+                clone_mirror(repo_url, path, reference=pool)
+                if not share_objects(path, pool, github_name):
+                    print(f"{repo_url} shares no history with {pool}; its mirror keeps its own objects.")
+        record_size(path)
+        os.utime(lock.name)
+        fcntl.flock(lock, fcntl.LOCK_SH)
+        yield path
+
+# Throwaway clone for a single run when no mirror store is used (local repositories are used in place)
+
+@contextmanager
+def local_clone(repo_path):
+    if not is_remote(repo_path):
+        if not os.path.isdir(repo_path):
+            raise FileNotFoundError(repo_path)
+        yield repo_path
+        return
+    with tempfile.TemporaryDirectory() as clone_dir:
+        run_git(['clone', '--quiet', '--bare', repo_path, clone_dir])
+        yield clone_dir
+
+#--------------------------------------------------------------------------------------------------------------
+
+# Eviction of the least recently used mirrors
+
+def evict_mirrors(mirror_dir, max_bytes):
+    # Pools count towards the budget; an evicted mirror's branches are dropped from its pool, and a pool is
+    # removed with its last member
+    if not os.path.isdir(mirror_dir):
+        return
+    mirrors = []
+    members = {}
+    pools_dir = os.path.join(mirror_dir, POOL_DIR)
+    if os.path.isdir(pools_dir):
+        members = {os.path.abspath(entry.path): 0 for entry in os.scandir(pools_dir) if entry.is_dir()}
+    for entry in os.scandir(mirror_dir):
+        if entry.is_dir() and entry.name.endswith('.git'):
+            github_name = entry.name[:-len('.git')]
+            try:
+                last_used = os.path.getmtime(lock_path(mirror_dir, github_name))
+            except OSError:
+                last_used = 0
+            pool = pool_of(entry.path)
+            if pool is not None:
+                members[pool] = members.get(pool, 0) + 1
+            mirrors.append((last_used, read_size(entry.path), github_name, pool))
+
+    total_size = sum(size for _, size, _, _ in mirrors) + sum(directory_size(pool) for pool in members)
+    if total_size > max_bytes:
+        total_size -= evict_unused_pools(mirror_dir, members)
+    shrunk_pools = set()
+    for last_used, size, github_name, pool in sorted(mirrors, key=lambda mirror: mirror[:3]):
+        if total_size <= max_bytes:
+            break
+        with open(lock_path(mirror_dir, github_name), 'a') as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                continue  # In use by a worker
+            shutil.rmtree(mirror_path(mirror_dir, github_name), ignore_errors=True)
+            total_size -= size
+            print(f"Evicted mirror {github_name} ({size / 1e6:.1f} MB).")
+        if pool is not None and os.path.isdir(pool):
+            members[pool] -= 1
+            with locked_pool(pool):
+                drop_member(pool, github_name)
+            shrunk_pools.add(pool)
+            if members[pool] == 0:
+                total_size -= evict_unused_pools(mirror_dir, members)
+    for pool in shrunk_pools:
+        # Drops the objects only evicted mirrors used from the pools that are kept
+        if members.get(pool, 0) > 0 and os.path.isdir(pool):
+            with locked_pool(pool):
+                repack_pool(pool)
+
+def has_members(mirror_dir, pool):
+    return any(entry.name.endswith('.git') and pool_of(entry.path) == pool for entry in os.scandir(mirror_dir))
+
+def evict_unused_pools(mirror_dir, members):
+    # Pools no mirror borrows from any more; returns the bytes freed
+    freed = 0
+    for pool, member_count in list(members.items()):
+        if member_count > 0:
+            continue
+        with open(pool[:-len('.git')] + '.lock', 'a') as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                continue  # A mirror is being cloned into it
+            if has_members(mirror_dir, pool):
+                continue  # Cloned into it since the scan
+            size = directory_size(pool)
+            shutil.rmtree(pool, ignore_errors=True)
+            freed += size
+            del members[pool]
+            print(f"Evicted pool {os.path.basename(pool)} ({size / 1e6:.1f} MB).")
+    return freed
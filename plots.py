@@ -0,0 +1,157 @@
+# Per-repository charts, rendered as a separate stage from the author totals that mining.py saves for every
+# repository (<name>/<name>_authors.csv), so mining itself never waits on matplotlib. Run from the folder the
+# repositories were mined into (or point --store at a dataset store), for all repositories or only the ones named
+# on the command line.
+
+import argparse
+import functools
+import multiprocessing
+import os
+
+import matplotlib
+import matplotlib.pyplot as plt
+import pandas as pd
+
+import store
+from svg_charts import bar_chart_svg, write_svg
+
+matplotlib.use('Agg')
+
+#--------------------------------------------------------------------------------------------------------------
+
+# Helper Functions
+
+def authors_csv_path(github_name):
+    return os.path.join(github_name, f"{github_name}_authors.csv")
+
+def find_mined_repos(current_dir):
+    return sorted(folder for folder in os.listdir(current_dir)
+                  if os.path.isdir(os.path.join(current_dir, folder))
+                  and os.path.exists(os.path.join(current_dir, authors_csv_path(folder))))
+
+def load_author_totals(github_name):
+    # Author names are kept verbatim (an author called "NA" is not a missing value); rows are in
+    # value_counts() order, most commits first
+    return pd.read_csv(authors_csv_path(github_name), keep_default_na=False, index_col='Author Name')
+
+def top_author_commits(author_totals):
+    return author_totals['Number of Commits'][:10]
+
+def top_author_impact(author_totals):
+    # Insertions and deletions of each of the top contributors, by author name
+    top_authors = author_totals['Number of Commits'].nlargest(10).index
+    return author_totals.loc[top_authors, ['insertions', 'deletions']].sort_index()
+
+#--------------------------------------------------------------------------------------------------------------
+
+# Plots of data
+
+def commits_by_authors(author_totals, github_name):
+    plt.figure()
+
+    # Plot the number of commits per author (top 10)
+    top_author_commits(author_totals).plot(kind='bar')
+
+    plt.xlabel('Author')
+    plt.ylabel('Number of Commits')
+    plt.title(f"Number of Commits per Author for {github_name}")
+    plt.xticks(rotation=45, ha='right')
+    plt.subplots_adjust(bottom=0.4)
+
+    plt.savefig(os.path.join(github_name, f"{github_name}_commits_per_author.png"), bbox_inches='tight')
+    print(f"Commits per author for {github_name} plotted successfully.")
+    plt.close()
+
+def plot_commit_impact_by_top_authors(author_totals, github_name):
+    plt.figure()
+
+    author_impact = top_author_impact(author_totals)
+    amount_of_authours = len(author_impact)
+    author_impact.plot(kind='bar', stacked=True)
+
+    plt.xlabel('Author')
+    plt.ylabel('Lines Changed (Insertions + Deletions)')
+    plt.title(f"Commit Impact by Top {amount_of_authours} Authors for {github_name}")
+    plt.xticks(rotation=45, ha='right')
+    plt.subplots_adjust(bottom=0.4)
+
+    plt.savefig(os.path.join(github_name, f"{github_name}_commit_impact_by_top_authors.png"))
+    print(f"Commit Impact by Top {amount_of_authours} authors for {github_name} plotted successfully.")
+    plt.close('all') # DataFrame.plot draws on a figure of its own
+
+# The same charts as SVG written from templates, without a matplotlib figure
+
+def commits_by_authors_svg(author_totals, github_name):
+    author_commits = top_author_commits(author_totals)
+    svg = bar_chart_svg(f"Number of Commits per Author for {github_name}", 'Author', 'Number of Commits',
+                        list(author_commits.index), [list(author_commits)])
+    write_svg(os.path.join(github_name, f"{github_name}_commits_per_author.svg"), svg)
+
+def plot_commit_impact_by_top_authors_svg(author_totals, github_name):
+    author_impact = top_author_impact(author_totals)
+    svg = bar_chart_svg(f"Commit Impact by Top {len(author_impact)} Authors for {github_name}", 'Author',
+                        'Lines Changed (Insertions + Deletions)', list(author_impact.index),
+                        [list(author_impact['insertions']), list(author_impact['deletions'])], ['insertions', 'deletions'])
+    write_svg(os.path.join(github_name, f"{github_name}_commit_impact_by_top_authors.svg"), svg)
+
+CHART_FORMATS = {
+    'svg': (commits_by_authors_svg, plot_commit_impact_by_top_authors_svg),
+    'png': (commits_by_authors, plot_commit_impact_by_top_authors),
+}
+
+def render_plots(github_name, chart_format='svg', author_totals=None):
+    try:
+        if author_totals is None:
+            author_totals = load_author_totals(github_name)
+        os.makedirs(github_name, exist_ok=True)
+        for plot in CHART_FORMATS[chart_format]:
+            plot(author_totals, github_name)
+        return True
+    except Exception as e:
+        print(f"Error plotting {github_name}: {e}")
+        plt.close('all')
+        return False
+
+def render_stored_plots(repo_authors, chart_format='svg'):
+    # (github_name, author totals) read from a dataset store
+    github_name, author_totals = repo_authors
+    return render_plots(github_name, chart_format, author_totals)
+
+#--------------------------------------------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description='Render the per-repository charts from the author totals saved by mining.py.')
+    parser.add_argument('github_names', nargs='*',
+                        help='Repository folders to plot, e.g. owner-name (default: every mined repository)')
+    parser.add_argument('--format', choices=CHART_FORMATS.keys(), default='svg',
+                        help="Chart format ('png' renders with matplotlib, 'svg' is written from templates and much faster)")
+    parser.add_argument('--store', default=None,
+                        help='Dataset store written by mining.py --store to read the author totals from (charts go to ./<name>/)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Number of repositories plotted in parallel')
+    args = parser.parse_args()
+
+    if args.github_names:
+        github_names = args.github_names
+    elif args.store is not None:
+        github_names = list(store.list_repos(args.store)['github_name'])
+    else:
+        github_names = find_mined_repos(os.getcwd())
+    print(f"Plotting {len(github_names)} repositories with {args.workers} workers.")
+    if args.store is not None:
+        # The author totals are read from the store partition by partition and handed to the workers
+        jobs = store.iter_authors(args.store, github_names)
+        render = functools.partial(render_stored_plots, chart_format=args.format)
+    else:
+        jobs = github_names
+        render = functools.partial(render_plots, chart_format=args.format)
+    if args.workers <= 1:
+        plotted = sum(map(render, jobs))
+    else:
+        # A fresh process every few repos keeps matplotlib's memory bounded
+        with multiprocessing.Pool(processes=args.workers, maxtasksperchild=200) as pool:
+            plotted = sum(pool.imap_unordered(render, jobs))
+    print(f"Plotted {plotted} of {len(github_names)} repositories.")
+
+
+if __name__ == '__main__':
+    main()
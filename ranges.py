@@ -0,0 +1,134 @@
+# Parallel extraction of giant histories (mining.py --range-workers). The non-merge history of HEAD is split
+# into contiguous ranges of commits, each extracted by a separate worker process against the same local copy,
+# and the rows of the ranges are merged back in history order, so the commit file is the same as when the
+# history is traversed serially. Workers are separate Python processes (this file run as a script) rather than
+# multiprocessing children, which the daemonic workers of the mining pool may not have.
+
+import fcntl
+import json
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+import time
+
+RANGE_MIN_COMMITS = 10000 # Shorter histories are traversed serially
+RANGES_PER_WORKER = 4 # More ranges than workers, so one slow range doesn't leave the other workers idle
+MIN_RANGE_COMMITS = 2500 # Fewer, longer ranges below this, as every worker process starts by importing mining.py
+ROW_BATCH_SIZE = 1000
+POLL_SECONDS = 0.1
+
+#--------------------------------------------------------------------------------------------------------------
+
+# Splitting the history
+
+def list_commits(repo_dir, since_commit=None):
+    # Hashes of the commits in the order pydriller traverses them (git rev-list --reverse --no-merges)
+    revisions = ['HEAD'] if since_commit is None else ['HEAD', f'^{since_commit}']
+    return subprocess.run(['git', '-C', repo_dir, 'rev-list', '--reverse', '--no-merges', *revisions], check=True,
+                          capture_output=True, text=True).stdout.split()
+
+def split_ranges(hashes, range_count):
+    size = -(-len(hashes) // range_count)
+    return [hashes[start:start + size] for start in range(0, len(hashes), size)]
+
+#--------------------------------------------------------------------------------------------------------------
+
+# Worker: extracts the commits listed in a file and pickles their rows, in batches, to an output file, followed
+# by the hits and misses of the commit cache
+
+def run_range(repo_dir, hashes_path, output_path, fields, cache_path=None, policy_key=None):
+    # mining.py imports this module, so it is only imported on the worker side
+    from pydriller import Git
+    import commit_cache
+    import mining
+
+    with open(hashes_path, encoding='utf-8') as file:
+        hashes = file.read().split()
+    # pydriller writes the repository's config when it opens it, which the workers must not do at the same time
+    with open(os.path.join(os.path.dirname(hashes_path), 'open.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        git = Git(repo_dir)
+        git.repo
+    cache = commit_cache.CommitCache(cache_path, policy_key) if cache_path else None
+    try:
+        rows = mining.commit_rows((git.get_commit(commit_hash) for commit_hash in hashes), fields, cache)
+        with open(output_path, 'wb') as output:
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= ROW_BATCH_SIZE:
+                    pickle.dump(batch, output)
+                    batch = []
+            if batch:
+                pickle.dump(batch, output)
+            pickle.dump({'hits': cache.hits if cache else 0, 'misses': cache.misses if cache else 0}, output)
+    finally:
+        if cache is not None:
+            cache.close()
+
+#--------------------------------------------------------------------------------------------------------------
+
+# Coordinator: runs the ranges on up to `workers` processes and yields their rows in range order, each range as
+# soon as it and the ranges before it are done
+
+def start_range(repo_dir, range_dir, index, hashes, fields, cache):
+    hashes_path = os.path.join(range_dir, f"{index}.hashes")
+    with open(hashes_path, 'w', encoding='utf-8') as file:
+        file.write('\n'.join(hashes))
+    # Workers inherit the environment, and with it the exclusion policy of the extraction
+    cache_arguments = [cache.path, cache.policy_key or ''] if cache is not None else ['', '']
+    command = [sys.executable, os.path.abspath(__file__), repo_dir, hashes_path, os.path.join(range_dir, f"{index}.rows"),
+               json.dumps(fields), *cache_arguments]
+    with open(os.path.join(range_dir, f"{index}.err"), 'w', encoding='utf-8') as stderr:
+        return subprocess.Popen(command, stderr=stderr)
+
+def read_range(range_dir, index, cache):
+    with open(os.path.join(range_dir, f"{index}.rows"), 'rb') as file:
+        while True:
+            item = pickle.load(file)
+            if isinstance(item, dict):
+                break
+            yield from item
+    if cache is not None:
+        cache.hits += item['hits']
+        cache.misses += item['misses']
+
+def extract_ranges(repo_dir, fields, hashes, workers, cache=None):
+    commit_ranges = split_ranges(hashes, max(1, min(workers * RANGES_PER_WORKER, len(hashes) // MIN_RANGE_COMMITS)))
+    print(f"Extracting {len(hashes)} commits in {len(commit_ranges)} ranges with {workers} workers.")
+    # The cache's batched writes are flushed so the workers see them
+    if cache is not None:
+        cache.flush()
+    with tempfile.TemporaryDirectory() as range_dir:
+        processes = {}
+        try:
+            for index in range(len(commit_ranges)):
+                while True:
+                    # Free workers start the next ranges, also while the rows of earlier ones are being written
+                    while (len(processes) < len(commit_ranges)
+                           and sum(process.poll() is None for process in processes.values()) < workers):
+                        next_index = len(processes)
+                        processes[next_index] = start_range(repo_dir, range_dir, next_index, commit_ranges[next_index],
+                                                            fields, cache)
+                    if processes[index].poll() is not None:
+                        break
+                    time.sleep(POLL_SECONDS)
+                if processes[index].returncode != 0:
+                    with open(os.path.join(range_dir, f"{index}.err"), encoding='utf-8', errors='replace') as stderr:
+                        error = stderr.read().strip().splitlines()
+                    raise RuntimeError(f"Range {index} of {repo_dir} failed: {error[-1] if error else processes[index].returncode}")
+                yield from read_range(range_dir, index, cache)
+                os.remove(os.path.join(range_dir, f"{index}.rows"))
+        finally:
+            # Also reached when the consumer stops early or a range failed
+            for process in processes.values():
+                if process.poll() is None:
+                    process.kill()
+                    process.wait()
+
+
+if __name__ == '__main__':
+    repo_dir, hashes_path, output_path, fields, cache_path, policy_key = sys.argv[1:7]
+    run_range(repo_dir, hashes_path, output_path, json.loads(fields), cache_path or None, policy_key or None)
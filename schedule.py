@@ -0,0 +1,193 @@
+# Size-aware scheduling: the cost of every repository (in commits) is estimated up front, and repositories are
+# dispatched longest first so the giants of a shard start early instead of making up its tail. A few workers
+# form a lane for small repositories, taking the cheapest first so results arrive from the start of a run;
+# once no small repositories are left they take the longest ones like the other workers.
+#
+# Estimates come from, in order: the commit count of a previous run (job manifest, --timings records, dataset
+# store), or the size of the repository's objects (its mirror, or a local copy) at roughly BYTES_PER_COMMIT.
+# Remote repositories with neither, as on a first run, are sized by the GitHub API (the 'size' of the
+# repository, one request each, authenticated with GITHUB_TOKEN if it is set); only repositories the API
+# cannot size either get the median estimate.
+
+import collections
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import queue
+import sqlite3
+import statistics
+import subprocess
+import threading
+import urllib.error
+
+from manifest import SMALL_REPO_COMMITS
+from mirror import github_metadata, github_repo, is_remote, mirror_path, read_size
+import store
+
+BYTES_PER_COMMIT = 20000 # Rough packed size of a commit with its trees and blobs, for size-based estimates
+API_PROBE_THREADS = 16
+
+#--------------------------------------------------------------------------------------------------------------
+
+# Commit counts of previous runs
+
+def manifest_commit_counts(manifest_path):
+    # A shared manifest keeps its commit counts on the coordinator, which reuses them itself (manifest.add_jobs)
+    if manifest_path is None or not os.path.exists(manifest_path):
+        return {}
+    connection = sqlite3.connect(manifest_path)
+    try:
+        columns = [row[1] for row in connection.execute('PRAGMA table_info(jobs)')]
+        if 'commit_count' not in columns:
+            return {}
+        return dict(connection.execute('SELECT repo_url, commit_count FROM jobs WHERE commit_count IS NOT NULL'))
+    finally:
+        connection.close()
+
+def timings_commit_counts(timings_path):
+    counts = {}
+    if timings_path is None or not os.path.exists(timings_path):
+        return counts
+    with open(timings_path, encoding='utf-8') as f:
+        for line in f:
+            record = json.loads(line)
+            # Records written before commit_count was recorded only have the commits extracted by their run
+            commit_count = record.get('commit_count') or record.get('commits')
+            if record.get('status') == 'done' and commit_count:
+                counts[record['repo']] = commit_count
+    return counts
+
+def store_commit_counts(store_dir):
+    if store_dir is None or not store.is_store(store_dir):
+        return {}
+    repos = store.list_repos(store_dir)
+    return dict(zip(repos['github_name'], repos['commit_count']))
+
+#--------------------------------------------------------------------------------------------------------------
+
+# Size probes
+
+def object_size(repo_dir):
+    # Bytes of the packed and loose objects, as git count-objects reports them (no object is read)
+    try:
+        output = subprocess.run(['git', '-C', repo_dir, 'count-objects', '-v'], check=True, capture_output=True,
+                                text=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    fields = dict(line.split(': ', 1) for line in output.splitlines() if ': ' in line)
+    return (int(fields.get('size-pack', 0)) + int(fields.get('size', 0))) * 1024
+
+def probe_size(repo_path, github_name, mirror_dir=None):
+    if mirror_dir is not None and os.path.isdir(mirror_path(mirror_dir, github_name)):
+        return read_size(mirror_path(mirror_dir, github_name))
+    if not is_remote(repo_path) and os.path.isdir(repo_path):
+        return object_size(repo_path)
+    return None
+
+def api_size(repo):
+    # Bytes of the repository as the GitHub API reports them (its 'size', in KB)
+    metadata = github_metadata(repo)
+    if metadata is None or not isinstance(metadata.get('size'), int):
+        return None
+    return metadata['size'] * 1024
+
+def api_sizes(repo_paths):
+    # Sizes of the GitHub repositories among repo_paths, requested a few at a time; once the rate limit is hit
+    # the remaining repositories are left unknown
+    repos = {repo_path: github_repo(repo_path) for repo_path in repo_paths}
+    repos = {repo_path: repo for repo_path, repo in repos.items() if repo is not None}
+    rate_limited = threading.Event()
+
+    def probe(repo_path):
+        if rate_limited.is_set():
+            return repo_path, None
+        try:
+            return repo_path, api_size(repos[repo_path])
+        except urllib.error.HTTPError:
+            rate_limited.set()
+            return repo_path, None
+
+    with ThreadPoolExecutor(API_PROBE_THREADS) as executor:
+        sizes = {repo_path: size for repo_path, size in executor.map(probe, repos) if size is not None}
+    if rate_limited.is_set():
+        print(f"The GitHub API rate limit was hit after sizing {len(sizes)} of {len(repos)} repositories"
+              f"{'' if os.environ.get('GITHUB_TOKEN') else ' (set GITHUB_TOKEN for a higher limit)'}.")
+    return sizes
+
+#--------------------------------------------------------------------------------------------------------------
+
+# Estimating and ordering
+
+def estimate_costs(repo_paths, github_names, mirror_dir=None, manifest_path=None, timings_path=None, store_dir=None,
+                   probe_api=True):
+    # Estimated commits of every repository; repositories nothing is known about get the median estimate
+    commit_counts = manifest_commit_counts(manifest_path)
+    for repo_path, commits in timings_commit_counts(timings_path).items():
+        commit_counts.setdefault(repo_path, commits)
+    stored_counts = store_commit_counts(store_dir)
+
+    costs = {}
+    sources = collections.Counter()
+    for repo_path, github_name in zip(repo_paths, github_names):
+        if repo_path in commit_counts or github_name in stored_counts:
+            costs[repo_path] = commit_counts.get(repo_path, stored_counts.get(github_name))
+            sources['from previous runs'] += 1
+            continue
+        size = probe_size(repo_path, github_name, mirror_dir)
+        if size is not None:
+            costs[repo_path] = size / BYTES_PER_COMMIT
+            sources['from object sizes'] += 1
+
+    unknown = [repo_path for repo_path in repo_paths if repo_path not in costs and is_remote(repo_path)]
+    if probe_api and unknown:
+        for repo_path, size in api_sizes(unknown).items():
+            costs[repo_path] = size / BYTES_PER_COMMIT
+            sources['from GitHub API sizes'] += 1
+
+    default_cost = statistics.median(costs.values()) if costs else 0
+    for repo_path in repo_paths:
+        if repo_path not in costs:
+            costs[repo_path] = default_cost
+            sources['unknown (median)'] += 1
+    print(f"Estimated the cost of {len(repo_paths)} repositories: "
+          f"{', '.join(f'{count} {source}' for source, count in sources.items()) or 'none'}.")
+    return costs
+
+def longest_first(repo_paths, costs):
+    # Ties (and repositories of unknown cost) keep their seed order
+    return sorted(repo_paths, key=lambda repo_path: -costs[repo_path])
+
+def lane_of(worker_index, small_lane_workers):
+    return 'small' if worker_index < small_lane_workers else 'large'
+
+#--------------------------------------------------------------------------------------------------------------
+
+# Dispatching to a pool: one repository in flight per worker. A slot of the small-repository lane takes the
+# cheapest repository left while it is small, every other slot the most expensive one
+
+def next_repo(pending, costs, lane):
+    if lane == 'small' and costs[pending[-1]] < SMALL_REPO_COMMITS:
+        return pending.pop()
+    return pending.popleft()
+
+def dispatch(pool, mine_repo, repo_paths, costs, workers, small_lane_workers=0):
+    pending = collections.deque(longest_first(repo_paths, costs))
+    finished = queue.Queue()
+
+    def submit(lane):
+        repo_path = next_repo(pending, costs, lane)
+        pool.apply_async(mine_repo, (repo_path,), callback=lambda result: finished.put((lane, result)),
+                         error_callback=lambda e: finished.put((lane, {
+                             'repo': repo_path, 'status': 'failed', 'error_class': 'worker_error', 'error_message': str(e)})))
+
+    in_flight = 0
+    for worker_index in range(min(workers, len(pending))):
+        submit(lane_of(worker_index, small_lane_workers))
+        in_flight += 1
+    while in_flight:
+        lane, result = finished.get()
+        in_flight -= 1
+        if pending:
+            submit(lane)
+            in_flight += 1
+        yield result
@@ -1,8 +1,12 @@
+import argparse
 import os
 import pandas as pd
 import re
 import matplotlib.pyplot as plt
 
+from store import is_store, load_analysis
+import warehouse
+
 # --------------------------------------------------------------------------------------
 
 # Helper Functions
@@ -92,6 +96,10 @@ def save_scores_to_csv(scores_df, filename):
 
 # Calculating Scores
 
+# Columns of the analysis record read by calculate_scores
+SCORE_COLUMNS = ['Gini Coefficient', 'Project Duration (Years and Months)', 'Average Commits per Day',
+                 'Average Score', 'Number of Contributors', 'Average Commit Size']
+
 def calculate_scores(analysis_df):
     # Gini Coefficient
     gini_coefficient = analysis_df['Gini Coefficient'].iloc[0]
@@ -143,6 +151,13 @@ def plot_quality_score_distribution(scores_df,current_directory):
 
 
 def main():
+    parser = argparse.ArgumentParser(description='Score the repositories mined into the current folder.')
+    parser.add_argument('--warehouse', default=None,
+                        help='SQLite warehouse written by mining.py --warehouse to read the analysis records from instead')
+    parser.add_argument('--min-gini', type=float, default=None,
+                        help='Only score repositories with a Gini coefficient above this (with --warehouse)')
+    args = parser.parse_args()
+
     all_scores = []
     columns = ['Folder Name', 'Gini Coefficient', 'Project Duration Score', 'Normalized Avg Commits/Day', 'Average Score', 'Total Committers', 'Average Commit Size', 'Gini-Committers Score']
 
@@ -157,14 +172,32 @@ def main():
     print('-- Repository Quality Scores --')
     print('Calculating scores...')
 
-    for root, dirs, files in os.walk('.'):
-        folder_name = os.path.basename(root)
-        for file in files:
-            if file.endswith('_analysis.csv'):
-                analysis_path = os.path.join(root, file)
-                analysis_df = pd.read_csv(analysis_path)
-                scores = calculate_scores(analysis_df)
-                all_scores.append((folder_name,) + scores)
+    # A warehouse holds every analysis record in one indexed table
+    if args.warehouse is not None:
+        connection = warehouse.connect(args.warehouse)
+        try:
+            analysis_data = warehouse.analysis_records(connection, args.min_gini)
+        finally:
+            connection.close()
+        for index in range(len(analysis_data)):
+            analysis_df = analysis_data.iloc[[index]]
+            all_scores.append((analysis_df['Project Name'].iloc[0],) + calculate_scores(analysis_df))
+    else:
+        # A dataset store (mining.py --store) holds every analysis record in the analysis.csv of its partitions
+        if is_store('.'):
+            analysis_data = load_analysis('.')
+            for index in range(len(analysis_data)):
+                analysis_df = analysis_data.iloc[[index]]
+                all_scores.append((analysis_df['Project Name'].iloc[0],) + calculate_scores(analysis_df))
+
+        for root, dirs, files in os.walk('.'):
+            folder_name = os.path.basename(root)
+            for file in files:
+                if file.endswith('_analysis.csv'):
+                    analysis_path = os.path.join(root, file)
+                    analysis_df = pd.read_csv(analysis_path, usecols=SCORE_COLUMNS)
+                    scores = calculate_scores(analysis_df)
+                    all_scores.append((folder_name,) + scores)
 
     print('Saving scores to CSV...')
 
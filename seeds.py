@@ -0,0 +1,172 @@
+# Seed manifest compiler: parses every seed file once (the Set_*.csv shards, with a header and the URL in the
+# 'Link' column, and github_top800.csv, one URL per line), canonicalises the URLs to owner/name, drops
+# duplicates and unusable entries, and parses the req_files/setup_files columns into flags. The result is a
+# small SQLite file that mining.py accepts in place of the seed CSVs and slices by --start/--end with a range
+# query on the position:
+#
+#   python seeds.py seeds.sqlite Set_*.csv github_top800.csv
+#   python mining.py seeds.sqlite --start 0 --end 10000
+
+import argparse
+import csv
+import json
+import os
+import re
+import sqlite3
+
+# https://github.com/<owner>/<name>, optionally with .git, a trailing slash or a /tree/<branch>/... suffix
+GITHUB_URL = re.compile(r'^(?:https?://)?(?:www\.)?github\.com/([A-Za-z0-9-]+)/([A-Za-z0-9._-]+?)(?:\.git)?(?:[/?#].*)?$')
+# The req_files/setup_files columns hold the repr of a list of PyGithub ContentFile objects
+CONTENT_FILE = re.compile(r'ContentFile\(path="([^"]*)"\)')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS seeds (
+    position INTEGER PRIMARY KEY,
+    repo TEXT NOT NULL UNIQUE COLLATE NOCASE,
+    url TEXT,
+    shard TEXT NOT NULL,
+    listings INTEGER NOT NULL,
+    projects TEXT,
+    has_setup_py INTEGER NOT NULL,
+    has_requirements_txt INTEGER NOT NULL,
+    req_files TEXT,
+    setup_files TEXT
+);
+CREATE TABLE IF NOT EXISTS rejected (
+    seed_file TEXT NOT NULL,
+    line INTEGER NOT NULL,
+    url TEXT
+);
+"""
+
+#--------------------------------------------------------------------------------------------------------------
+
+# Helper Functions
+
+def is_seed_manifest(path):
+    if not os.path.isfile(path):
+        return False
+    with open(path, 'rb') as file:
+        return file.read(16) == b'SQLite format 3\x00'
+
+def github_url(repo):
+    return f"https://github.com/{repo}"
+
+def canonical_repo(url):
+    # (owner/name, clone URL), or None for entries that name no repository. Local copies laid out as
+    # .../github.com/<owner>/<name> (as mirrors and test fixtures are) keep their path as the clone URL
+    url = url.strip()
+    match = GITHUB_URL.match(url)
+    if match:
+        owner, name = match.groups()
+        if name in ('.', '..'):
+            return None
+        return f"{owner}/{name}", github_url(f"{owner}/{name}")
+    parts = url.rstrip('/').split('/')
+    if os.path.isabs(url) and 'github.com' in parts[:-2]:
+        index = parts.index('github.com')
+        return f"{parts[index + 1]}/{parts[index + 2]}", url
+    return None
+
+def content_file_paths(value):
+    return CONTENT_FILE.findall(value or '')
+
+def read_seed_entries(seed_file):
+    # (line, url, project, req_files, setup_files) for every entry of a seed file, with or without a header
+    with open(seed_file, newline='', encoding='utf-8') as file:
+        reader = csv.reader(file)
+        first_row = next(reader, None)
+        if first_row is None:
+            return
+        if 'Link' in first_row:
+            header = first_row
+        else:
+            header = ['Link']
+            yield 1, first_row[0] if first_row else '', None, [], []
+        columns = {name: header.index(name) for name in ('Link', 'Project', 'req_files', 'setup_files') if name in header}
+        for line, row in enumerate(reader, 2):
+            values = {name: row[column] for name, column in columns.items() if len(row) > column}
+            yield (line, values.get('Link', ''), values.get('Project'), content_file_paths(values.get('req_files')),
+                   content_file_paths(values.get('setup_files')))
+
+#--------------------------------------------------------------------------------------------------------------
+
+# Compiling: repositories keep the position and shard of their first listing; later listings add their project
+# and files
+
+def compile_seeds(seed_files):
+    repos = {}
+    rejected = []
+    entry_count = 0
+    for seed_file in seed_files:
+        shard = os.path.splitext(os.path.basename(seed_file))[0]
+        for line, url, project, req_files, setup_files in read_seed_entries(seed_file):
+            entry_count += 1
+            canonical = canonical_repo(url)
+            if canonical is None:
+                rejected.append((seed_file, line, url))
+                continue
+            repo, clone_url = canonical
+            seed = repos.setdefault(repo.lower(), {'repo': repo, 'url': clone_url, 'shard': shard, 'listings': 0,
+                                                   'projects': [], 'req_files': [], 'setup_files': []})
+            seed['listings'] += 1
+            if project and project not in seed['projects']:
+                seed['projects'].append(project)
+            seed['req_files'] += [path for path in req_files if path not in seed['req_files']]
+            seed['setup_files'] += [path for path in setup_files if path not in seed['setup_files']]
+    return list(repos.values()), rejected, entry_count
+
+def write_seed_manifest(manifest_path, seeds, rejected):
+    # Written under a temporary name and renamed, so workers never see a half-written manifest
+    partial_path = manifest_path + '.partial'
+    if os.path.exists(partial_path):
+        os.remove(partial_path)
+    connection = sqlite3.connect(partial_path)
+    try:
+        connection.executescript(SCHEMA)
+        connection.executemany('INSERT INTO seeds VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', (
+            (position, seed['repo'], seed['url'] if seed['url'] != github_url(seed['repo']) else None, seed['shard'], seed['listings'], ','.join(seed['projects']) or None,
+             int(any(os.path.basename(path) == 'setup.py' for path in seed['setup_files'])),
+             int(any(os.path.basename(path) == 'requirements.txt' for path in seed['req_files'])),
+             json.dumps(seed['req_files']) if seed['req_files'] else None,
+             json.dumps(seed['setup_files']) if seed['setup_files'] else None)
+            for position, seed in enumerate(seeds)))
+        connection.executemany('INSERT INTO rejected VALUES (?, ?, ?)', rejected)
+        connection.commit()
+        connection.execute('VACUUM')
+    finally:
+        connection.close()
+    os.replace(partial_path, manifest_path)
+
+#--------------------------------------------------------------------------------------------------------------
+
+# Reading a slice of the manifest
+
+def read_seed_range(manifest_path, start=0, end=None):
+    # (clone URL, shard) of the repositories at positions [start, end), in seed order
+    connection = sqlite3.connect(f"file:{manifest_path}?mode=ro", uri=True)
+    try:
+        rows = connection.execute('SELECT repo, url, shard FROM seeds WHERE position >= ? AND position < ? ORDER BY position',
+                                  (start, end if end is not None else 2 ** 63 - 1)).fetchall()
+    finally:
+        connection.close()
+    return [(url or github_url(repo), shard) for repo, url, shard in rows]
+
+#--------------------------------------------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description='Compile the seed CSVs into one deduplicated, indexed seed manifest for mining.py.')
+    parser.add_argument('manifest', help='SQLite seed manifest to write')
+    parser.add_argument('seed_files', nargs='+', help='Seed CSV files (Set_*.csv shards and github_top800.csv), in mining order')
+    args = parser.parse_args()
+
+    seeds, rejected, entry_count = compile_seeds(args.seed_files)
+    write_seed_manifest(args.manifest, seeds, rejected)
+    print(f"Compiled {len(seeds)} repositories from {entry_count} entries of {len(args.seed_files)} seed files "
+          f"({entry_count - len(seeds) - len(rejected)} duplicates, {len(rejected)} invalid) into {args.manifest}.")
+    for seed_file, line, url in rejected[:10]:
+        print(f"Invalid entry at {seed_file}:{line}: {url!r}")
+
+
+if __name__ == '__main__':
+    main()
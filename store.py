@@ -0,0 +1,296 @@
+# Consolidated dataset store (mining.py --store) replacing the folder per repository. Each mined repository is
+# appended to the partition of its seed shard (optionally split further by a prefix of the hash of its name):
+#
+#   <store>/shard=Set_0_10000[/prefix=3f]/analysis.csv     one analysis record per repository
+#                                        /authors.csv      author totals of every repository (for plots.py)
+#                                        /commits-00000.csv (or .parquet) commit segments of many repositories
+#   <store>/index.sqlite                 index of the repositories and manifest of the data files
+#
+# Every row carries its 'Project Name'. Loading all repositories is a handful of large sequential reads of the
+# files listed in the manifest instead of a walk over a folder per repository.
+
+from contextlib import contextmanager
+import csv
+import fcntl
+import glob
+import hashlib
+import os
+import shutil
+import sqlite3
+import time
+
+import pandas as pd
+
+import commit_files
+from commit_files import pa, pq
+
+INDEX_FILE = 'index.sqlite'
+SEGMENT_MAX_BYTES = 1e9 # A new CSV commit segment is started past this size
+PARQUET_COMPACT_REPOS = 200 # Parquet repositories staged in a partition before they are compacted into a segment
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS repos (
+    github_name TEXT PRIMARY KEY,
+    repo_url TEXT NOT NULL,
+    partition TEXT NOT NULL,
+    commits_file TEXT,
+    commit_count INTEGER NOT NULL,
+    added_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS repos_partition ON repos (partition);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    partition TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    rows INTEGER NOT NULL DEFAULT 0,
+    bytes INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS files_kind ON files (kind, partition);
+"""
+
+#--------------------------------------------------------------------------------------------------------------
+
+# Helper Functions
+
+def is_store(store_dir):
+    return os.path.exists(os.path.join(store_dir, INDEX_FILE))
+
+def connect(store_dir):
+    os.makedirs(store_dir, exist_ok=True)
+    connection = sqlite3.connect(os.path.join(store_dir, INDEX_FILE), timeout=60, isolation_level=None)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.executescript(SCHEMA)
+    return connection
+
+def partition_of(github_name, shard, hash_prefix_length=0):
+    partition = f"shard={shard}"
+    if hash_prefix_length > 0:
+        partition += f"/prefix={hashlib.sha1(github_name.encode('utf-8')).hexdigest()[:hash_prefix_length]}"
+    return partition
+
+@contextmanager
+def locked_partition(store_dir, partition):
+    # Workers appending to the same partition take turns
+    partition_dir = os.path.join(store_dir, partition)
+    os.makedirs(partition_dir, exist_ok=True)
+    with open(os.path.join(partition_dir, '.lock'), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        yield partition_dir
+
+def record_file(connection, store_dir, path, partition, kind, rows):
+    connection.execute("""
+        INSERT INTO files (path, partition, kind, rows, bytes) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (path) DO UPDATE SET rows = rows + excluded.rows, bytes = excluded.bytes""",
+        (os.path.relpath(path, store_dir), partition, kind, rows, os.path.getsize(path)))
+
+#--------------------------------------------------------------------------------------------------------------
+
+# Appending to the files of a partition
+
+def append_rows(path, header, rows):
+    # Returns the number of rows appended. The header is only written to a new file; rows appended to an existing
+    # one are written under its header (e.g. author totals without insertions and deletions, of a narrower
+    # extraction plan), with the columns it lacks left out and those the rows lack left empty
+    new_file = not os.path.exists(path)
+    file_header = header if new_file else read_header(path)
+    if file_header != header:
+        positions = [header.index(column) if column in header else None for column in file_header]
+        rows = ([row[position] if position is not None else '' for position in positions] for row in rows)
+    with open(path, mode='a', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        if new_file:
+            writer.writerow(header)
+        row_count = 0
+        for row in rows:
+            writer.writerow(row)
+            row_count += 1
+    return row_count
+
+def read_rows(csv_path):
+    with open(csv_path, newline='', encoding='utf-8') as file:
+        reader = csv.reader(file)
+        header = next(reader)
+        return header, list(reader)
+
+def read_header(csv_path):
+    with open(csv_path, newline='', encoding='utf-8') as file:
+        return next(csv.reader(file), None)
+
+def csv_segment_path(partition_dir, header):
+    # The last segment, or a new one once it is full or was started for other commit columns
+    segments = sorted(glob.glob(os.path.join(partition_dir, 'commits-*.csv')))
+    if segments and os.path.getsize(segments[-1]) < SEGMENT_MAX_BYTES and read_header(segments[-1]) == header:
+        return segments[-1]
+    return os.path.join(partition_dir, f"commits-{len(segments):05d}.csv")
+
+def append_csv_commits(partition_dir, github_name, commits_path):
+    with open(commits_path, newline='', encoding='utf-8') as file:
+        reader = csv.reader(file)
+        header = ['Project Name'] + next(reader)
+        segment_path = csv_segment_path(partition_dir, header)
+        row_count = append_rows(segment_path, header, ([github_name] + row for row in reader))
+    return segment_path, row_count
+
+def stage_parquet_commits(partition_dir, github_name, commits_path):
+    # Rewritten with its Project Name column into the staging folder, compacted later with other repositories
+    table = pa.concat_tables([pq.read_table(part_path) for part_path in commit_files.part_paths(commits_path)])
+    table = table.add_column(0, 'Project Name', pa.array([github_name] * table.num_rows, pa.string()))
+    staging_dir = os.path.join(partition_dir, 'staging')
+    os.makedirs(staging_dir, exist_ok=True)
+    staged_path = os.path.join(staging_dir, f"{github_name}.parquet")
+    pq.write_table(table, staged_path, compression='zstd')
+    return staged_path, table.num_rows
+
+def compact_partition(connection, store_dir, partition):
+    # Merge the staged Parquet repositories of a partition into one segment (called with the partition locked)
+    partition_dir = os.path.join(store_dir, partition)
+    staged_paths = sorted(glob.glob(os.path.join(partition_dir, 'staging', '*.parquet')))
+    if not staged_paths:
+        return
+    table = pa.concat_tables([pq.read_table(staged_path) for staged_path in staged_paths], promote_options='permissive')
+    segment_count = len(glob.glob(os.path.join(partition_dir, 'commits-*.parquet')))
+    segment_path = os.path.join(partition_dir, f"commits-{segment_count:05d}.parquet")
+    pq.write_table(table, segment_path + '.partial', compression='zstd',
+                   use_dictionary=['Project Name'] + [field for field in commit_files.DICTIONARY_FIELDS if field in table.column_names])
+    os.replace(segment_path + '.partial', segment_path)
+
+    relative_paths = [os.path.relpath(staged_path, store_dir) for staged_path in staged_paths]
+    connection.execute('BEGIN IMMEDIATE')
+    record_file(connection, store_dir, segment_path, partition, 'commits', table.num_rows)
+    connection.executemany('DELETE FROM files WHERE path = ?', [(path,) for path in relative_paths])
+    connection.executemany('UPDATE repos SET commits_file = ? WHERE commits_file = ?',
+                           [(os.path.relpath(segment_path, store_dir), path) for path in relative_paths])
+    connection.execute('COMMIT')
+    for staged_path in staged_paths:
+        os.remove(staged_path)
+    print(f"Compacted {len(staged_paths)} repositories into {segment_path}.")
+
+def discard_unindexed(connection, store_dir, partition, partition_dir):
+    # A file is indexed with its size once the rows appended to it are complete, so what lies beyond that size
+    # (or a file not indexed at all) was left by an add or compaction that failed half-way. It is cut off before
+    # the next add appends to the partition, so a retry doesn't add the same rows twice. Called with the
+    # partition locked
+    indexed_sizes = dict(connection.execute('SELECT path, bytes FROM files WHERE partition = ?', (partition,)))
+    for path in glob.glob(os.path.join(partition_dir, '*.csv')) + glob.glob(os.path.join(partition_dir, 'commits-*.parquet')):
+        size = indexed_sizes.get(os.path.relpath(path, store_dir))
+        if size is None:
+            print(f"Removing {path}, which was never indexed.")
+            os.remove(path)
+        elif os.path.getsize(path) > size:
+            print(f"Truncating {path} to its {size} indexed bytes.")
+            with open(path, 'r+b') as file:
+                file.truncate(size)
+
+#--------------------------------------------------------------------------------------------------------------
+
+# Adding a mined repository: its files are appended to its partition, indexed, and its folder is removed
+
+def add_repo(store_dir, repo_url, github_name, shard, hash_prefix_length=0):
+    connection = connect(store_dir)
+    try:
+        if connection.execute('SELECT 1 FROM repos WHERE github_name = ?', (github_name,)).fetchone():
+            print(f"{github_name} is already in the store {store_dir}; keeping the stored copy.")
+            shutil.rmtree(github_name, ignore_errors=True)
+            return
+        partition = partition_of(github_name, shard, hash_prefix_length)
+        commits_path = commit_files.find_commits_path(github_name, github_name)
+        analysis_header, analysis_rows = read_rows(os.path.join(github_name, f"{github_name}_analysis.csv"))
+        authors_header, authors_rows = read_rows(os.path.join(github_name, f"{github_name}_authors.csv"))
+
+        with locked_partition(store_dir, partition) as partition_dir:
+            discard_unindexed(connection, store_dir, partition, partition_dir)
+            analysis_path = os.path.join(partition_dir, 'analysis.csv')
+            authors_path = os.path.join(partition_dir, 'authors.csv')
+            append_rows(analysis_path, analysis_header, analysis_rows)
+            append_rows(authors_path, ['Project Name'] + authors_header, ([github_name] + row for row in authors_rows))
+            if commit_files.is_parquet(commits_path):
+                segment_path, commit_count = stage_parquet_commits(partition_dir, github_name, commits_path)
+            else:
+                segment_path, commit_count = append_csv_commits(partition_dir, github_name, commits_path)
+
+            connection.execute('BEGIN IMMEDIATE')
+            record_file(connection, store_dir, analysis_path, partition, 'analysis', len(analysis_rows))
+            record_file(connection, store_dir, authors_path, partition, 'authors', len(authors_rows))
+            record_file(connection, store_dir, segment_path, partition, 'commits', commit_count)
+            connection.execute('INSERT INTO repos VALUES (?, ?, ?, ?, ?, ?)',
+                               (github_name, repo_url, partition, os.path.relpath(segment_path, store_dir), commit_count, time.time()))
+            connection.execute('COMMIT')
+
+            staged_count = len(glob.glob(os.path.join(partition_dir, 'staging', '*.parquet')))
+            if staged_count >= PARQUET_COMPACT_REPOS:
+                compact_partition(connection, store_dir, partition)
+        shutil.rmtree(github_name)
+    finally:
+        connection.close()
+
+def compact(store_dir):
+    # Compact what is left staged at the end of a run
+    connection = connect(store_dir)
+    try:
+        partitions = [row[0] for row in connection.execute("SELECT DISTINCT partition FROM files WHERE path LIKE '%/staging/%'")]
+        for partition in partitions:
+            with locked_partition(store_dir, partition):
+                compact_partition(connection, store_dir, partition)
+    finally:
+        connection.close()
+
+#--------------------------------------------------------------------------------------------------------------
+
+# Reading the store
+
+def file_paths(store_dir, kind, partition=None):
+    connection = connect(store_dir)
+    try:
+        query = 'SELECT path FROM files WHERE kind = ?' + (' AND partition = ?' if partition else '') + ' ORDER BY path'
+        rows = connection.execute(query, (kind, partition) if partition else (kind,)).fetchall()
+    finally:
+        connection.close()
+    return [os.path.join(store_dir, row[0]) for row in rows]
+
+def list_repos(store_dir):
+    connection = connect(store_dir)
+    try:
+        return pd.read_sql_query('SELECT * FROM repos ORDER BY partition, github_name', connection)
+    finally:
+        connection.close()
+
+def load_analysis(store_dir):
+    return pd.concat([pd.read_csv(path) for path in file_paths(store_dir, 'analysis')], ignore_index=True)
+
+def iter_commit_files(store_dir, columns=None):
+    # The commits of one data file at a time; a repository's commits are all in the same file
+    wanted = None if columns is None else ['Project Name'] + list(columns)
+    for path in file_paths(store_dir, 'commits'):
+        if path.endswith('.parquet'):
+            fields = pq.read_schema(path).names
+            table = pq.read_table(path, columns=None if wanted is None else [field for field in wanted if field in fields])
+            yield commit_files.parquet_frame(table)
+        else:
+            fields = read_header(path)
+            yield pd.read_csv(path, usecols=None if wanted is None else [field for field in wanted if field in fields],
+                              keep_default_na=False, na_values=commit_files.CSV_NA_VALUES)
+
+def load_commits(store_dir, columns=None):
+    return pd.concat(iter_commit_files(store_dir, columns), ignore_index=True)
+
+def iter_authors(store_dir, github_names=None):
+    # Author totals of every repository (or of the named ones) as (github_name, totals), in the form plots.py reads
+    # them from <name>/<name>_authors.csv. Each partition's authors.csv is read and grouped once, not once per
+    # repository
+    repos = list_repos(store_dir)
+    if github_names is not None:
+        for github_name in sorted(set(github_names) - set(repos['github_name'])):
+            print(f"{github_name} is not in the store {store_dir}.")
+        repos = repos[repos['github_name'].isin(github_names)]
+    for partition, partition_repos in repos.groupby('partition', sort=False):
+        wanted = set(partition_repos['github_name'])
+        authors = pd.read_csv(os.path.join(store_dir, partition, 'authors.csv'), keep_default_na=False)
+        for github_name, repo_authors in authors.groupby('Project Name', sort=False):
+            if github_name in wanted:
+                yield github_name, repo_authors.drop(columns='Project Name').set_index('Author Name')
+
+def load_authors(store_dir, github_name):
+    # Author totals of one repository
+    for _, authors in iter_authors(store_dir, [github_name]):
+        return authors
+    raise KeyError(f"{github_name} is not in the store {store_dir}")
@@ -0,0 +1,94 @@
+# Fixed-layout SVG bar charts written straight from string templates, for the per-repository top-10 author
+# charts. No figure objects are built, so a chart costs a few string joins instead of a matplotlib render.
+
+from html import escape
+import math
+
+WIDTH = 640
+HEIGHT = 480
+MARGIN_LEFT = 80
+MARGIN_RIGHT = 20
+MARGIN_TOP = 40
+MARGIN_BOTTOM = 150 # Room for the rotated author names
+PLOT_WIDTH = WIDTH - MARGIN_LEFT - MARGIN_RIGHT
+PLOT_HEIGHT = HEIGHT - MARGIN_TOP - MARGIN_BOTTOM
+BAR_WIDTH = 0.5 # Fraction of each slot, as in pandas' bar plots
+COLOURS = ['#1f77b4', '#ff7f0e'] # matplotlib's first default colours
+
+SVG_TEMPLATE = """<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" viewBox="0 0 {width} {height}" font-family="DejaVu Sans, sans-serif" font-size="11">
+<rect width="{width}" height="{height}" fill="white"/>
+<text x="{title_x}" y="{title_y}" text-anchor="middle" font-size="13">{title}</text>
+{y_ticks}
+{bars}
+<path d="M{left},{top}V{bottom}H{right}" fill="none" stroke="black"/>
+{x_ticks}
+<text x="{title_x}" y="{x_label_y}" text-anchor="middle">{x_label}</text>
+<text transform="translate({y_label_x},{y_label_y}) rotate(-90)" text-anchor="middle">{y_label}</text>
+{legend}
+</svg>
+"""
+Y_TICK_TEMPLATE = '<path d="M{left},{y}h-4" stroke="black"/><text x="{text_x}" y="{y}" text-anchor="end" dominant-baseline="middle">{value}</text>'
+X_TICK_TEMPLATE = '<text transform="translate({x},{y}) rotate(-45)" text-anchor="end">{label}</text>'
+BAR_TEMPLATE = '<rect x="{x:.2f}" y="{y:.2f}" width="{width:.2f}" height="{height:.2f}" fill="{colour}"><title>{label}: {value}</title></rect>'
+LEGEND_TEMPLATE = '<rect x="{x}" y="{y}" width="12" height="10" fill="{colour}"/><text x="{text_x}" y="{text_y}">{name}</text>'
+
+#--------------------------------------------------------------------------------------------------------------
+
+# Helper Functions
+
+def nice_ticks(max_value, max_ticks=8):
+    # Evenly spaced ticks with a 1, 2 or 5 step covering 0..max_value
+    if max_value <= 0:
+        return [0, 1]
+    raw_step = max_value / max_ticks
+    magnitude = 10 ** math.floor(math.log10(raw_step))
+    step = next(multiple * magnitude for multiple in (1, 2, 5, 10) if multiple * magnitude >= raw_step)
+    return [index * step for index in range(math.ceil(max_value / step) + 1)]
+
+def format_tick(value):
+    return f"{value:,.0f}" if value == int(value) else f"{value:g}"
+
+#--------------------------------------------------------------------------------------------------------------
+
+# Bar chart of one or more stacked series (one value per label in each series)
+
+def bar_chart_svg(title, x_label, y_label, labels, series, series_names=None):
+    totals = [sum(values) for values in zip(*series)] if labels else []
+    ticks = nice_ticks(max(totals, default=0))
+    scale = PLOT_HEIGHT / ticks[-1]
+    bottom = MARGIN_TOP + PLOT_HEIGHT
+    slot = PLOT_WIDTH / max(len(labels), 1)
+
+    y_ticks = [Y_TICK_TEMPLATE.format(left=MARGIN_LEFT, y=f"{bottom - tick * scale:.2f}", text_x=MARGIN_LEFT - 7,
+                                      value=format_tick(tick)) for tick in ticks]
+
+    bars = []
+    x_ticks = []
+    for index, label in enumerate(labels):
+        x = MARGIN_LEFT + slot * (index + (1 - BAR_WIDTH) / 2)
+        stacked = 0
+        for values, colour in zip(series, COLOURS):
+            value = values[index]
+            bars.append(BAR_TEMPLATE.format(x=x, y=bottom - (stacked + value) * scale, width=slot * BAR_WIDTH,
+                                            height=value * scale, colour=colour, label=escape(str(label)), value=value))
+            stacked += value
+        x_ticks.append(X_TICK_TEMPLATE.format(x=f"{MARGIN_LEFT + slot * (index + 0.5):.2f}", y=bottom + 14,
+                                              label=escape(str(label))))
+
+    legend = []
+    if series_names:
+        for index, (name, colour) in enumerate(zip(series_names, COLOURS)):
+            y = MARGIN_TOP + 8 + index * 16
+            legend.append(LEGEND_TEMPLATE.format(x=WIDTH - MARGIN_RIGHT - 90, y=y, colour=colour,
+                                                 text_x=WIDTH - MARGIN_RIGHT - 72, text_y=y + 9, name=escape(name)))
+
+    return SVG_TEMPLATE.format(
+        width=WIDTH, height=HEIGHT, title=escape(title), title_x=MARGIN_LEFT + PLOT_WIDTH / 2, title_y=MARGIN_TOP - 15,
+        y_ticks='\n'.join(y_ticks), bars='\n'.join(bars), x_ticks='\n'.join(x_ticks), legend='\n'.join(legend),
+        left=MARGIN_LEFT, right=MARGIN_LEFT + PLOT_WIDTH, top=MARGIN_TOP, bottom=bottom,
+        x_label=escape(x_label), x_label_y=HEIGHT - 10, y_label=escape(y_label),
+        y_label_x=18, y_label_y=MARGIN_TOP + PLOT_HEIGHT / 2)
+
+def write_svg(path, svg):
+    with open(path, mode='w', encoding='utf-8') as file:
+        file.write(svg)
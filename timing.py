@@ -0,0 +1,130 @@
+# Stage-level timing of the mining of each repository. process_repo starts a recording, the stages of
+# extraction and analysis add their durations to it, and one JSON line per repository is appended to the
+# timings file. Run this file on one or more timings files to rank the slowest stages and repositories.
+# Stages named '<stage>.<part>' are nested inside '<stage>' (e.g. extract.diff is part of extract).
+
+from collections import defaultdict
+from contextlib import contextmanager
+import argparse
+import json
+import resource
+import time
+
+import pandas as pd
+
+# Recording of the repository being mined by this process
+current = None
+
+#--------------------------------------------------------------------------------------------------------------
+
+# Recording
+
+def start():
+    global current
+    current = {'started': time.time(), 'stages': defaultdict(float), 'commits': 0, 'bytes_written': 0,
+               'excluded_files': defaultdict(int)}
+
+@contextmanager
+def stage(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if current is not None:
+            current['stages'][name] += time.perf_counter() - started
+
+def add_commits(commit_count):
+    if current is not None:
+        current['commits'] += commit_count
+
+def add_bytes(byte_count):
+    if current is not None:
+        current['bytes_written'] += byte_count
+
+def add_excluded(counts):
+    # File changes left out of the diffs by the exclusion policy, by reason (see exclusion.py)
+    if current is not None:
+        for reason, count in counts.items():
+            current['excluded_files'][reason] += count
+
+def finish():
+    global current
+    recording, current = current, None
+    if recording is None:
+        return None
+    # Peaks over the lifetime of the process (per repository when it is mined in an isolated process)
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    peak_children_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    return {
+        'total_seconds': time.time() - recording['started'],
+        'stages': {name: round(seconds, 4) for name, seconds in recording['stages'].items()},
+        'commits': recording['commits'],
+        'bytes_written': recording['bytes_written'],
+        'excluded_files': dict(recording['excluded_files']),
+        'peak_rss_mb': round(peak_rss, 1),
+        'peak_children_rss_mb': round(peak_children_rss, 1)
+    }
+
+def write_record(timings_path, repo_path, result):
+    record = {
+        'repo': repo_path,
+        'status': result.get('status'),
+        'error_class': result.get('error_class'),
+        'commit_count': result.get('commit_count'), # Whole history, while 'commits' are those extracted by the run
+        'finished_at': time.time()
+    }
+    record.update(result.get('timings') or {})
+    # One short line per write in append mode, so workers can share the file
+    with open(timings_path, mode='a', encoding='utf-8') as file:
+        file.write(json.dumps(record) + '\n')
+
+#--------------------------------------------------------------------------------------------------------------
+
+# Summary of a shard
+
+def load_records(timings_paths):
+    records = []
+    for timings_path in timings_paths:
+        with open(timings_path, encoding='utf-8') as file:
+            records.extend(json.loads(line) for line in file if line.strip())
+    return pd.DataFrame(records)
+
+# Columns of the summary; the records of isolated processes that were killed have only some of them
+# (isolation.partial_timings), and the others count as missing
+SUMMARY_COLUMNS = ['repo', 'status', 'total_seconds', 'commits', 'bytes_written', 'peak_rss_mb', 'stages']
+
+def summarise(records, top):
+    records = records.reindex(columns=list(dict.fromkeys([*records.columns, *SUMMARY_COLUMNS])))
+    print(f"Repositories: {len(records)}")
+    print(records['status'].value_counts().to_string())
+    print(f"Total time: {records['total_seconds'].sum():.1f}s, commits: {records['commits'].sum():.0f}, "
+          f"written: {records['bytes_written'].sum() / 1e6:.1f} MB, "
+          f"peak RSS: {records['peak_rss_mb'].max():.0f} MB")
+
+    stages = pd.DataFrame(list(records['stages'].dropna()), index=records['stages'].dropna().index).fillna(0)
+    if not stages.empty:
+        stage_totals = pd.DataFrame({
+            'Total (s)': stages.sum(),
+            'Mean (s)': stages.mean(),
+            'Max (s)': stages.max(),
+            'Share (%)': stages.sum() / records['total_seconds'].sum() * 100
+        }).sort_values('Total (s)', ascending=False)
+        print("\nSlowest stages:")
+        print(stage_totals.round(3).to_string())
+
+    slowest = records.sort_values('total_seconds', ascending=False).head(top).copy()
+    slowest['slowest_stage'] = [max(stages_of_repo, key=stages_of_repo.get) if isinstance(stages_of_repo, dict) and stages_of_repo else ''
+                                for stages_of_repo in slowest['stages']]
+    print(f"\nSlowest {top} repositories:")
+    print(slowest[['repo', 'status', 'total_seconds', 'commits', 'slowest_stage']].round(2).to_string(index=False))
+
+def main():
+    parser = argparse.ArgumentParser(description='Rank the slowest stages and repositories of mining runs.')
+    parser.add_argument('timings_files', nargs='+', help='JSON lines written by mining.py --timings')
+    parser.add_argument('--top', type=int, default=20, help='Number of slowest repositories to list')
+    args = parser.parse_args()
+    summarise(load_records(args.timings_files), args.top)
+
+
+if __name__ == '__main__':
+    main()
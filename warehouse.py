@@ -0,0 +1,266 @@
+# Optional SQLite warehouse of the mined commits and analysis records (mining.py --warehouse), indexed by
+# repository and author so questions across repositories are index lookups instead of rescans of every commit
+# file. Repositories already mined can be loaded with `python warehouse.py DB load`, run from the folder they
+# were mined into (or with --store), and queried with the author and weekly subcommands.
+
+import argparse
+import json
+import os
+import sqlite3
+import time
+
+import pandas as pd
+
+import commit_files
+import store
+
+# Analysis record columns (as in <name>_analysis.csv) and their warehouse columns
+ANALYSIS_COLUMNS = {
+    'Project Name': 'repo',
+    'Project Duration (Years and Months)': 'duration',
+    'Gini Coefficient': 'gini',
+    'Number of Contributors': 'contributors',
+    'Average Commits per Day': 'commits_per_day',
+    'Average Commits per Week': 'commits_per_week',
+    'Average Commits per Month': 'commits_per_month',
+    'Percentage with >= 5 Commits': 'percentage_5_or_more',
+    'Average Commit Size': 'average_commit_size',
+    'Number of Unique Timezones': 'unique_timezones',
+    'Average Title Length': 'average_title_length',
+    'Average Title Ends with Fullstop': 'average_title_fullstop',
+    'Average Title First Character Capital': 'average_title_capital',
+    'Average Score': 'average_score'
+}
+
+# Commit columns loaded into the warehouse; dates are stored as UTC epoch seconds
+COMMIT_COLUMNS = {
+    'Hash': 'hash',
+    'Commit Message': 'message',
+    'Author Name': 'author_name',
+    'Author Email': 'author_email',
+    'Author Date': 'author_date',
+    'Author Timezone': 'author_timezone',
+    'insertions': 'insertions',
+    'deletions': 'deletions',
+    'lines': 'lines',
+    'files': 'files',
+    'modified_files': 'modified_files'
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS repos (
+    repo TEXT PRIMARY KEY,
+    duration TEXT,
+    gini REAL,
+    contributors INTEGER,
+    commits_per_day REAL,
+    commits_per_week REAL,
+    commits_per_month REAL,
+    percentage_5_or_more REAL,
+    average_commit_size REAL,
+    unique_timezones INTEGER,
+    average_title_length REAL,
+    average_title_fullstop REAL,
+    average_title_capital REAL,
+    average_score REAL
+);
+CREATE INDEX IF NOT EXISTS repos_gini ON repos (gini);
+CREATE TABLE IF NOT EXISTS commits (
+    repo TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    message TEXT,
+    author_name TEXT,
+    author_email TEXT,
+    author_date INTEGER,
+    author_timezone INTEGER,
+    insertions INTEGER,
+    deletions INTEGER,
+    lines INTEGER,
+    files INTEGER,
+    modified_files TEXT,
+    PRIMARY KEY (repo, hash)
+);
+CREATE INDEX IF NOT EXISTS commits_repo_author ON commits (repo, author_name);
+CREATE INDEX IF NOT EXISTS commits_repo_date ON commits (repo, author_date);
+CREATE INDEX IF NOT EXISTS commits_author_email ON commits (author_email);
+"""
+
+LOAD_CHUNK_SIZE = 50000 # Commits per write transaction
+LOCK_RETRIES = 5 # Attempts at the write lock, each waiting out the busy timeout, before a load fails
+LOCK_RETRY_SECONDS = 5 # Pause before the next attempt, doubled every time
+
+#--------------------------------------------------------------------------------------------------------------
+
+# Helper Functions
+
+def connect(warehouse_path):
+    connection = sqlite3.connect(warehouse_path, timeout=60, isolation_level=None)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.executescript(SCHEMA)
+    return connection
+
+def write_transaction(connection, write, *args):
+    # Runs write in a transaction of its own, trying again while other loaders keep the write lock
+    for attempt in range(LOCK_RETRIES):
+        try:
+            connection.execute('BEGIN IMMEDIATE')
+            break
+        except sqlite3.OperationalError as e:
+            if 'locked' not in str(e) or attempt == LOCK_RETRIES - 1:
+                raise
+            time.sleep(LOCK_RETRY_SECONDS * 2 ** attempt)
+    try:
+        write(*args)
+        connection.execute('COMMIT')
+    except Exception:
+        connection.execute('ROLLBACK')
+        raise
+
+def epoch_seconds(dates):
+    return (pd.to_datetime(dates, utc=True) - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(seconds=1)
+
+def commit_rows(github_name, chunk):
+    # Columns missing from the commit file are loaded as NULL
+    columns = {}
+    for column, warehouse_column in COMMIT_COLUMNS.items():
+        if column not in chunk:
+            columns[warehouse_column] = [None] * len(chunk)
+        elif column == 'Author Date':
+            columns[warehouse_column] = epoch_seconds(chunk[column]).tolist()
+        elif column == 'modified_files':
+            # Lists from Parquet are stored as JSON; the CSV already holds the list as text
+            columns[warehouse_column] = [files if isinstance(files, str) else json.dumps(list(files)) for files in chunk[column]]
+        else:
+            columns[warehouse_column] = chunk[column].astype(object).where(chunk[column].notna(), None).tolist()
+    return zip([github_name] * len(chunk), *columns.values())
+
+#--------------------------------------------------------------------------------------------------------------
+
+# Loading
+
+def delete_repo(connection, github_name):
+    connection.execute('DELETE FROM repos WHERE repo = ?', (github_name,))
+    connection.execute('DELETE FROM commits WHERE repo = ?', (github_name,))
+
+def load_repo(connection, github_name, analysis_df, commit_chunks):
+    # Replaces what the warehouse held for the repository in short write transactions of at most LOAD_CHUNK_SIZE
+    # commits, so parallel loaders (mining.py workers) never wait long for the write lock. The analysis record
+    # is written last, so a repository is only listed once all its commits are in; a failed load is redone from
+    # the start
+    insert_commits = f"INSERT INTO commits (repo, {', '.join(COMMIT_COLUMNS.values())}) VALUES ({', '.join('?' * (len(COMMIT_COLUMNS) + 1))})"
+    analysis_df = analysis_df[[column for column in ANALYSIS_COLUMNS if column in analysis_df]]
+    insert_analysis = (f"INSERT OR REPLACE INTO repos ({', '.join(ANALYSIS_COLUMNS[column] for column in analysis_df)}) "
+                       f"VALUES ({', '.join('?' * len(analysis_df.columns))})")
+    write_transaction(connection, delete_repo, connection, github_name)
+    commit_count = 0
+    for chunk in commit_chunks:
+        for start in range(0, len(chunk), LOAD_CHUNK_SIZE):
+            # Converted before the transaction, which then only holds the lock for the inserts
+            rows = list(commit_rows(github_name, chunk.iloc[start:start + LOAD_CHUNK_SIZE]))
+            write_transaction(connection, connection.executemany, insert_commits, rows)
+        commit_count += len(chunk)
+    write_transaction(connection, connection.executemany, insert_analysis,
+                      analysis_df.astype(object).where(analysis_df.notna(), None).itertuples(index=False))
+    return commit_count
+
+def load_repo_folder(warehouse_path, github_name):
+    # A repository in its folder, as left by process_repo
+    connection = connect(warehouse_path)
+    try:
+        analysis_df = pd.read_csv(os.path.join(github_name, f"{github_name}_analysis.csv"))
+        commits_path = commit_files.find_commits_path(github_name, github_name)
+        commit_chunks = commit_files.iter_commit_chunks(commits_path, COMMIT_COLUMNS, LOAD_CHUNK_SIZE)
+        return load_repo(connection, github_name, analysis_df, commit_chunks)
+    finally:
+        connection.close()
+
+def load_store(warehouse_path, store_dir):
+    # Every repository of a dataset store, one commit file at a time
+    connection = connect(warehouse_path)
+    try:
+        analysis_data = store.load_analysis(store_dir)
+        for commits in store.iter_commit_files(store_dir, COMMIT_COLUMNS):
+            for github_name, commit_chunk in commits.groupby('Project Name', sort=False):
+                load_repo(connection, github_name, analysis_data[analysis_data['Project Name'] == github_name], [commit_chunk])
+        return len(analysis_data)
+    finally:
+        connection.close()
+
+#--------------------------------------------------------------------------------------------------------------
+
+# Queries
+
+def analysis_records(connection, min_gini=None):
+    # Analysis records with the column names of <name>_analysis.csv, as score.py reads them
+    columns = ', '.join(f'{warehouse_column} AS "{column}"' for column, warehouse_column in ANALYSIS_COLUMNS.items())
+    query = f"SELECT {columns} FROM repos" + (' WHERE gini > ?' if min_gini is not None else '') + ' ORDER BY repo'
+    return pd.read_sql_query(query, connection, params=(min_gini,) if min_gini is not None else ())
+
+def commit_frame(connection, columns):
+    # Commit columns of every repository, with dates back as UTC timestamps
+    selected = ', '.join(f'{COMMIT_COLUMNS[column]} AS "{column}"' for column in columns)
+    commits = pd.read_sql_query(f"SELECT {selected} FROM commits", connection)
+    if 'Author Date' in commits:
+        commits['Author Date'] = pd.to_datetime(commits['Author Date'], unit='s', utc=True)
+    return commits
+
+def has_author_emails(connection):
+    # Commit files mined without the repos_by_author step have no Author Email column, loaded as NULL
+    return connection.execute('SELECT 1 FROM commits WHERE author_email IS NOT NULL LIMIT 1').fetchone() is not None
+
+def repos_by_author(connection, author_email):
+    return pd.read_sql_query("""
+        SELECT repo, COUNT(*) AS commits, datetime(MIN(author_date), 'unixepoch') AS first_commit,
+               datetime(MAX(author_date), 'unixepoch') AS last_commit
+        FROM commits WHERE author_email = ? GROUP BY repo ORDER BY commits DESC""", connection, params=(author_email,))
+
+def weekly_commit_counts(connection, min_gini=None):
+    # Commits per week ending on Sunday, as resample('W') counts them; weeks without commits are 0
+    query = """
+        SELECT date(author_date, 'unixepoch', 'weekday 0') AS week, COUNT(*) AS commits FROM commits
+        WHERE author_date IS NOT NULL""" + (' AND repo IN (SELECT repo FROM repos WHERE gini > ?)' if min_gini is not None else '') + """
+        GROUP BY week ORDER BY week"""
+    counts = pd.read_sql_query(query, connection, params=(min_gini,) if min_gini is not None else ())
+    weekly = pd.Series(counts['commits'].values, index=pd.DatetimeIndex(pd.to_datetime(counts['week'], utc=True)), name='commits')
+    return weekly.asfreq('W', fill_value=0)
+
+#--------------------------------------------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description='Load mined repositories into the SQLite commit warehouse and query it.')
+    parser.add_argument('warehouse', help='SQLite warehouse file')
+    commands = parser.add_subparsers(dest='command', required=True)
+    load = commands.add_parser('load', help='Load the repositories mined into this folder (or a dataset store)')
+    load.add_argument('--store', default=None, help='Dataset store written by mining.py --store')
+    author = commands.add_parser('author', help='Repositories a given author committed to')
+    author.add_argument('author_email')
+    weekly = commands.add_parser('weekly', help='Weekly commits across repositories')
+    weekly.add_argument('--min-gini', type=float, default=None, help='Only repositories with a Gini coefficient above this')
+    args = parser.parse_args()
+
+    if args.command == 'load':
+        if args.store is not None:
+            print(f"Loaded {load_store(args.warehouse, args.store)} repositories from {args.store}.")
+        else:
+            github_names = [folder for folder in sorted(os.listdir('.'))
+                            if os.path.exists(os.path.join(folder, f"{folder}_analysis.csv"))
+                            and commit_files.find_commits_path(folder, folder) is not None]
+            for github_name in github_names:
+                print(f"Loaded {load_repo_folder(args.warehouse, github_name)} commits of {github_name}.")
+        return
+
+    connection = connect(args.warehouse)
+    try:
+        if args.command == 'author':
+            if not has_author_emails(connection):
+                parser.error(f"no commit in {args.warehouse} has an author email; mine with --warehouse (or --steps "
+                             "repos_by_author) and load the repositories again")
+            print(repos_by_author(connection, args.author_email).to_string(index=False))
+        else:
+            print(weekly_commit_counts(connection, args.min_gini).to_string())
+    finally:
+        connection.close()
+
+
+if __name__ == '__main__':
+    main()